@@ -1,26 +1,80 @@
 '''
 Flask Application
 '''
-from flask import Flask, jsonify, request
-from models import Experience, Education, Skill
-from spellchecker import SpellChecker
-import google.generativeai as genai
-from dotenv import load_dotenv
+import cProfile
 import os
+import pstats
+from dataclasses import fields
+from io import StringIO
+from threading import Lock
+from time import perf_counter
+
+from dotenv import load_dotenv
+from flask import Flask, Response, g, jsonify, request, send_file, stream_with_context
+
+from assets import AssetStore
+from batch import parse_ndjson, validate_operations
+from response_compression import ResponseCompressor, compress
+from json_provider import FastJSONProvider
+from models import Experience, Education, Skill
+from pagination import PaginationError, paginate, parse_fields, parse_limit, project
+from response_cache import ResponseCache
+from schema import Schema, ValidationError, decode_json
+from lazy import Lazy, preload
+from metrics import metrics
+from shards import ShardCluster, ShardUnavailable, start_shards
+from spellcheck import CachedSpellChecker, SpellcheckEngine, spellchecker_loader
+from storage import SECTION_MODELS, open_store
+from text_index import TextIndex
+from suggestion_cache import SuggestionCache
+from suggestions import GeminiClient, SuggestionQueueFull, SuggestionService, build_prompt
 
 load_dotenv()
 
 app = Flask(__name__)
-
-DEFAULT_LOGO_URL = "./example-logo.png"
+app.json = FastJSONProvider(app)
+
+metrics.enabled = os.getenv("METRICS_ENABLED", "0") == "1"
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0") == "1"
+PROFILE_LIMIT = 40
+profile_lock = Lock()
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+THUMBNAIL_SIZES = os.getenv("ASSET_THUMBNAIL_SIZES", "64,128")
+assets = AssetStore(os.getenv("ASSET_DIRECTORY", os.path.join(app.instance_path, "assets")),
+                    thumbnail_sizes=[int(size) for size in THUMBNAIL_SIZES.split(",") if size],
+                    cache_bytes=int(os.getenv("ASSET_CACHE_BYTES", str(16 * 2 ** 20))))
+ASSET_MAX_BYTES = int(os.getenv("ASSET_MAX_BYTES", str(2 * 2 ** 20)))
+
+# Logo files shipped with the app are served as assets from the app
+# directory, and records naming them point at their hashed URL
+BUNDLED_LOGOS = {
+    name: assets.url(assets.register_file(os.path.join(app.root_path, name)))
+    for name in ("example-logo.png",)
+}
+DEFAULT_LOGO_URL = BUNDLED_LOGOS["example-logo.png"]
 
 def get_logo(logo):
     """
-    Returns the logo if it exists, otherwise returns the default logo URL.
+    Returns the asset URL of a bundled logo file, the logo itself for any
+    other value, or the default logo URL when it is missing.
     """
-    return logo if logo else DEFAULT_LOGO_URL
+    if not logo:
+        return DEFAULT_LOGO_URL
+    return BUNDLED_LOGOS.get(logo.removeprefix("./"), logo)
 
-data = {
+# Request bodies are decoded straight into models by compiled schemas
+SCHEMAS = {section: Schema(model, get_logo) for section, model in SECTION_MODELS.items()}
+
+data = open_store(os.getenv("STORAGE_BACKEND", "sqlite"),
+                  os.getenv("STORAGE_PATH", "resume.db"),
+                  fsync=os.getenv("WAL_FSYNC", "batch"),
+                  snapshot_every=int(os.getenv("WAL_SNAPSHOT_EVERY", "10000")))
+
+# Seed data is only written when the store is empty, so a persistent store
+# keeps its records across restarts
+data.seed({
     "experience": [
         Experience("Software Developer",
                    "A Cool Company",
@@ -42,40 +96,254 @@ data = {
               "1-2 Years",
               get_logo("example-logo.png"))
     ]
-}
+})
+
+# The dictionary is loaded on first use unless PRELOAD asks for it earlier
+load_spell = spellchecker_loader(os.getenv("SPELLCHECK_BACKEND", "pyspellchecker"),
+                                 os.getenv("SYMSPELL_INDEX_PATH", "symspell.idx"))
+
+def load_warm_spell():
+    """
+    Loads the spell checker and fills the correction cache from the
+    warm-up word list, if one is configured, whichever the preload mode
+    """
+    checker = load_spell()
+    if os.getenv("SPELLCHECK_WARMUP_FILE"):
+        spell.warmup_from_file(os.getenv("SPELLCHECK_WARMUP_FILE"), checker)
+    return checker
+
+spell = CachedSpellChecker(Lazy(load_warm_spell),
+                           maxsize=int(os.getenv("SPELLCHECK_CACHE_SIZE", "10000")))
+spellcheck_engine = SpellcheckEngine(
+    spell,
+    workers=int(os.getenv("SPELLCHECK_WORKERS", "0")),
+    chunk_size=int(os.getenv("SPELLCHECK_CHUNK_SIZE", "64")),
+    parallel_threshold=int(os.getenv("SPELLCHECK_PARALLEL_THRESHOLD", "256")),
+    loader=load_spell
+)
+
+def start_tenant_shards():
+    """
+    Connects to the shards listed in SHARD_ADDRESSES, or starts SHARD_COUNT
+    shard processes for the multi-tenant routes. Only one app process may
+    start shards, so that every worker sees the same tenant data; the
+    others answer 503 until SHARD_ADDRESSES is set.
+    """
+    if os.getenv("SHARD_ADDRESSES"):
+        return ShardCluster(os.getenv("SHARD_ADDRESSES").split(","))
+    return start_shards(int(os.getenv("SHARD_COUNT", str(os.cpu_count()))), loader=load_spell,
+                        lock_path=os.path.join(app.instance_path, "shards.lock"))
+
+# Shard processes are only started once a user's resume is requested
+tenant_shards = Lazy(start_tenant_shards)
+
+response_cache = ResponseCache()
+compressor = ResponseCompressor(min_size=int(os.getenv("COMPRESSION_MIN_BYTES", "1024")))
+
+DEFAULT_PAGE_SIZE = 100
+
+text_index = TextIndex()
+
+def record_added(section, record_id, record):
+    '''
+    Updates derived state after a record was added to a section
+    '''
+    spellcheck_engine.record_added(section, record_id)
+    text_index.record_added(section, record_id, record, data[section].version)
+
+def record_updated(section, record_id, record):
+    '''
+    Updates derived state after the record with an ID was replaced
+    '''
+    spellcheck_engine.record_updated(section, record_id)
+    text_index.record_updated(section, record_id, record, data[section].version)
+
+def record_removed(section, record_id):
+    '''
+    Updates derived state after the record with an ID was removed
+    '''
+    spellcheck_engine.record_removed(section, record_id)
+    text_index.record_removed(section, record_id, data[section].version)
+
+def cached_response(key, version, build):
+    '''
+    Returns a JSON body from the response cache with a strong ETag, or 304
+    when it matches the request's If-None-Match. Bodies large enough to be
+    compressed are sent in the negotiated content coding, compressed once
+    per version.
+    '''
+    def serialize():
+        return app.json.dumps_bytes(build())
+
+    body, etag = response_cache.get(key, version, serialize)
+    encoding = compressor.negotiate(request.accept_encodings)
+    if encoding is not None and len(body) >= compressor.min_size:
+        body, etag = response_cache.get_variant(key, version, serialize, encoding, compress)
+    else:
+        encoding = None
+
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, 200, mimetype='application/json')
+    if encoding is not None:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.set_etag(etag)
+    return response
+
+def collection_response(section, serialize):
+    '''
+    Returns a collection, paginated with limit/cursor and projected with
+    fields when the request asks for it
+    '''
+    if not {'limit', 'cursor', 'fields'} & request.args.keys():
+        # Records are encoded directly by the JSON provider
+        return cached_response(section, data[section].version, lambda: list(data[section]))
 
-spell = SpellChecker()
+    try:
+        selected = None
+        if 'fields' in request.args:
+            allowed = [field.name for field in fields(SECTION_MODELS[section])]
+            selected = parse_fields(request.args['fields'], allowed)
+
+        if not {'limit', 'cursor'} & request.args.keys():
+            return jsonify([project(serialize(item), selected) for item in data[section]]), 200
+
+        limit = parse_limit(request.args.get('limit', DEFAULT_PAGE_SIZE))
+        page, next_cursor = paginate(data[section], limit, request.args.get('cursor'))
+    except PaginationError as error:
+        return jsonify({'error': str(error)}), 400
+
+    # Items carry their ID, which no longer follows from their position
+    return jsonify({
+        'items': [{'id': record_id, **project(serialize(item), selected)}
+                  for record_id, item in page],
+        'next_cursor': next_cursor
+    }), 200
+
+def load_gemini_client():
+    """
+    Imports and configures the Gemini SDK and returns a client for it
+    """
+    import google.generativeai as genai  # pylint: disable=import-outside-toplevel
+    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+    return GeminiClient(genai)
+
+suggestion_service = SuggestionService(
+    load_gemini_client,
+    workers=int(os.getenv("SUGGESTION_WORKERS", "4")),
+    max_queue=int(os.getenv("SUGGESTION_QUEUE_SIZE", "32")),
+    timeout=float(os.getenv("SUGGESTION_TIMEOUT", "30")),
+    cache=SuggestionCache(
+        maxsize=int(os.getenv("SUGGESTION_CACHE_SIZE", "1024")),
+        ttl=float(os.getenv("SUGGESTION_CACHE_TTL", "86400")),
+        path=os.getenv("SUGGESTION_CACHE_PATH")
+    )
+)
+
+def warm_spellchecker():
+    """
+    Loads the spell dictionary, which also fills the correction cache from
+    the warm-up word list
+    """
+    spell.unknown([])
+
+def warm_gemini_client():
+    """
+    Imports the Gemini SDK and builds the shared client
+    """
+    return suggestion_service.client
 
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+preload_thread = preload(os.getenv("PRELOAD", "lazy"), [warm_spellchecker, warm_gemini_client])
 
+@metrics.timed("gemini_suggestions")
 def get_gemini_suggestions(prompt):
     """
     Sends a prompt to GeminiAPI and returns a list of suggestions.
+
+    Calls run on the suggestion service's worker pool, and concurrent
+    calls for the same prompt share one upstream request.
     """
     try:
-        model = genai.GenerativeModel(
-            model_name="gemini-1.5-flash",
-            generation_config={
-                "temperature": 0.7,
-                "top_p": 0.9,
-                "top_k": 50,
-                "max_output_tokens": 150,
-                "response_mime_type": "text/plain"
-            }
-        )
-        
-        chat_session = model.start_chat(history=[])
-        response = chat_session.send_message(prompt)
-        
-        # Process the response to extract suggestions
-        suggestions_text = response.text
-        suggestions = [s.strip("- ").strip() for s in suggestions_text.split('\n') if s.strip()]
-        
-        return suggestions
+        return suggestion_service.suggest(prompt)
+    except SuggestionQueueFull:
+        raise
     except Exception as e:
         app.logger.error(f"GeminiAPI Error: {e}")
         return []
 
+def profile_summary(profiler, response):
+    '''
+    Returns a plain text response with the pstats summary of a profiled
+    request, sorted by cumulative time
+    '''
+    summary = StringIO()
+    stats = pstats.Stats(profiler, stream=summary)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(PROFILE_LIMIT)
+    profiled = Response(f"{request.method} {request.full_path} -> {response.status}\n\n"
+                        f"{summary.getvalue()}", 200, mimetype='text/plain')
+    profiled.headers['X-Profiled-Status'] = str(response.status_code)
+    return profiled
+
+@app.before_request
+def start_request():
+    '''
+    Starts the request timer, and the profiler for ?profile=1 requests
+    when profiling is enabled
+    '''
+    if metrics.enabled:
+        g.request_start = perf_counter()
+    if PROFILING_ENABLED and request.args.get('profile') == '1':
+        # Only one profiler can be active at a time
+        if not profile_lock.acquire(blocking=False):  # pylint: disable=consider-using-with
+            return jsonify({'error': 'Another request is being profiled'}), 503
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+    return None
+
+@app.after_request
+def compress_response(response):
+    '''
+    Compresses the responses that were not compressed from the response
+    cache, in the content coding negotiated from Accept-Encoding. It is
+    registered before finish_request, so it runs after it.
+    '''
+    return compressor.compress_response(response, compressor.negotiate(request.accept_encodings))
+
+@app.after_request
+def finish_request(response):
+    '''
+    Returns the profile summary instead of the response for profiled
+    requests, and records the request duration once the body was sent
+    '''
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        try:
+            # Streamed bodies are produced here, so they are profiled too
+            response.get_data()
+        finally:
+            profiler.disable()
+            profile_lock.release()
+        response = profile_summary(profiler, response)
+
+    if metrics.enabled and 'request_start' in g:
+        start = g.request_start
+        method, endpoint, status = request.method, request.endpoint, response.status_code
+        response.call_on_close(lambda: metrics.observe_request(method, endpoint, status,
+                                                               perf_counter() - start))
+    return response
+
+@app.route('/metrics')
+def metrics_endpoint():
+    '''
+    Returns the request and hot-path histograms in the Prometheus text
+    format
+    '''
+    if not metrics.enabled:
+        return jsonify({'error': 'Metrics are disabled'}), 404
+    return Response(metrics.expose(), 200, content_type='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/test')
 def hello_world():
     '''
@@ -89,72 +357,53 @@ def experience():
     Handle experience requests
     '''
     if request.method == 'GET':
-        experiences = [{
-            'title': exp.title,
-            'company': exp.company,
-            'start_date': exp.start_date,
-            'end_date': exp.end_date,
-            'description': exp.description,
-            'logo': get_logo(exp.logo)  # Use helper to get logo or default
-        } for exp in data['experience']]
-        return jsonify(experiences), 200
+        return collection_response('experience', Experience.to_dict)
 
     if request.method == 'POST':
-        experience_data = request.json
-        new_experience = Experience(
-            experience_data['title'],
-            experience_data['company'],
-            experience_data['start_date'],
-            experience_data['end_date'],
-            experience_data['description'],
-            get_logo(experience_data.get('logo'))  # Use helper to handle missing logo
-        )
-        data['experience'].append(new_experience)
-        index = len(data['experience']) - 1
-        return jsonify({'id': str(index)}), 201
+        new_experience = SCHEMAS['experience'].decode(request.get_data())
+        experience_id = data['experience'].add(new_experience)
+        record_added('experience', experience_id, new_experience)
+        return jsonify({'id': str(experience_id)}), 201
 
     return jsonify({}), 400
 
-@app.route('/resume/experience/<int:experience_id>', methods=['PUT'])
+@app.route('/resume/experience/<int:experience_id>', methods=['PUT', 'DELETE'])
 def experience_at_id(experience_id):
     '''
-    Handles PUT request to update an Experience at a specific ID
+    Handles PUT and DELETE requests for an Experience at a specific ID
     '''
     if request.method == 'PUT':
-        if 0 <= experience_id < len(data['experience']):
-            updated_data = request.get_json()
-
-            # Validate that all required fields are present
-            required_fields = ['title', 'company', 'start_date', 'end_date', 'description', 'logo']
-            if not all(field in updated_data for field in required_fields):
-                return jsonify({'error': f'All fields {required_fields} are required'}), 400
-
-            data['experience'][experience_id] = Experience(
-                title=updated_data['title'],
-                company=updated_data['company'],
-                start_date=updated_data['start_date'],
-                end_date=updated_data['end_date'],
-                description=updated_data['description'],
-                logo=get_logo(updated_data.get('logo'))  # Use helper here
-            )
-
-            return jsonify(data['experience'][experience_id].__dict__), 200
+        if experience_id in data['experience']:
+            updated_experience = SCHEMAS['experience'].decode(request.get_data())
+            if not data['experience'].replace(experience_id, updated_experience):
+                return jsonify({'error': 'Experience not found'}), 404
+            record_updated('experience', experience_id, updated_experience)
+
+            return jsonify(updated_experience.to_dict()), 200
         else:
             return jsonify({'error': 'Experience not found'}), 404
+
+    if request.method == 'DELETE':
+        deleted_experience = data['experience'].remove(experience_id)
+        if deleted_experience is not None:
+            record_removed('experience', experience_id)
+            return jsonify({"message": "Experience deleted", "data": deleted_experience.to_dict()}), 200
+        else:
+            return jsonify({"error": "Experience not found"}), 404
         
 @app.route('/resume/experience/<int:experience_id>/suggestions', methods=['GET'])
 def experience_suggestions(experience_id):
     """
     Provides suggestions to improve the description field of a specific Experience entry.
     """
-    if 0 <= experience_id < len(data['experience']):
+    if experience_id in data['experience']:
         current_description = data['experience'][experience_id].description
-        prompt = (
-            f"The following is a job description:\n\"{current_description}\"\n\n"
-            "Provide three suggestions to enhance this job description for better clarity and impact."
-        )
+        prompt = build_prompt(current_description)
         
-        suggestions = get_gemini_suggestions(prompt)
+        try:
+            suggestions = get_gemini_suggestions(prompt)
+        except SuggestionQueueFull:
+            return jsonify({"error": "Too many suggestion requests, try again later"}), 503
         
         if suggestions:
             return jsonify({"suggestions": suggestions}), 200
@@ -163,46 +412,51 @@ def experience_suggestions(experience_id):
     else:
         return jsonify({'error': 'Experience not found'}), 404
 
+@app.route('/resume/experience/suggestions', methods=['POST'])
+def experience_suggestions_batch():
+    '''
+    Provides suggestions for several Experience entries at once. The body
+    holds {"ids": [...]}; descriptions are sent in as few LLM calls as the
+    token budget allows, and failures are reported per ID.
+    '''
+    ids = (request.get_json(silent=True) or {}).get('ids')
+    # bool is a subclass of int, but JSON true/false are not IDs
+    if not isinstance(ids, list) or not all(
+            isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        return jsonify({'error': 'ids must be a list of experience IDs'}), 400
+
+    descriptions = {}
+    results = {}
+    for experience_id in ids:
+        exp = data['experience'].get(experience_id)
+        if exp is None:
+            results[experience_id] = {'error': 'Experience not found'}
+        else:
+            descriptions[experience_id] = exp.description
+
+    try:
+        with metrics.timer("gemini_suggestions_batch"):
+            results.update(suggestion_service.suggest_batch(
+                descriptions, token_budget=int(os.getenv("SUGGESTION_BATCH_TOKENS", "2000"))))
+    except SuggestionQueueFull:
+        return jsonify({"error": "Too many suggestion requests, try again later"}), 503
+
+    return jsonify({'results': [dict(results[i], id=i) for i in dict.fromkeys(ids)]}), 200
+
 @app.route('/resume/education', methods=['GET', 'POST'])
 def education():
     '''
     Handles education requests
     '''
     if request.method == 'GET':
-        educations = [{
-            'course': edu.course,
-            'school': edu.school,
-            'start_date': edu.start_date,
-            'end_date': edu.end_date,
-            'grade': edu.grade,
-            'logo': get_logo(edu.logo)  # Use helper to get logo or default
-        } for edu in data['education']]
-        return jsonify(educations), 200
+        return collection_response('education', Education.to_dict)
 
     if request.method == 'POST':
-        new_education = request.json
-
-        if (
-            'course' not in new_education
-            or 'school' not in new_education
-            or 'start_date' not in new_education
-            or 'end_date' not in new_education
-            or 'grade' not in new_education
-            or 'logo' not in new_education
-        ):
-            return jsonify({'error': 'All fields are required'}), 400
-
-        new_edu = Education(
-            new_education['course'],
-            new_education['school'],
-            new_education['start_date'],
-            new_education['end_date'],
-            new_education['grade'],
-            get_logo(new_education.get('logo'))  # Use helper here
-        )
-        data['education'].append(new_edu)
-
-        return jsonify({'message': 'Education added', 'data': new_edu.__dict__, 'index': len(data['education']) - 1}), 201
+        new_edu = SCHEMAS['education'].decode(request.get_data())
+        education_id = data['education'].add(new_edu)
+        record_added('education', education_id, new_edu)
+
+        return jsonify({'message': 'Education added', 'data': new_edu.to_dict(), 'index': education_id}), 201
 
     return jsonify({}), 400
 
@@ -212,43 +466,28 @@ def education_at_id(education_id=None):
     Handles education requests at a specific ID
     '''
     if request.method == 'GET':
-        if 0 <= education_id < len(data['education']):
-            edu = data['education'][education_id]
-            return jsonify({
-                'course': edu.course,
-                'school': edu.school,
-                'start_date': edu.start_date,
-                'end_date': edu.end_date,
-                'grade': edu.grade,
-                'logo': get_logo(edu.logo)  # Use helper to get logo or default
-            }), 200
+        edu = data['education'].get(education_id)
+        if edu is not None:
+            return jsonify(edu.to_dict()), 200
         else:
             return jsonify({'error': 'Education not found'}), 404
 
     if request.method == 'PUT':
-        if 0 <= education_id < len(data['education']):
-            updated_data = request.get_json()
-
-            course = updated_data.get('course')
-            school = updated_data.get('school')
-            start_date = updated_data.get('start_date')
-            end_date = updated_data.get('end_date')
-            grade = updated_data.get('grade')
-            logo = get_logo(updated_data.get('logo'))  # Use helper to handle missing logo
-
-            if not (course and school and start_date and end_date and grade and logo):
-                return jsonify({'error': 'Invalid input, all fields (course, school, start_date, end_date, grade, logo) are required'}), 400
-
-            data['education'][education_id] = Education(course, school, start_date, end_date, grade, logo)
+        if education_id in data['education']:
+            updated_edu = SCHEMAS['education'].decode(request.get_data())
+            if not data['education'].replace(education_id, updated_edu):
+                return jsonify({'error': 'Education not found'}), 404
+            record_updated('education', education_id, updated_edu)
 
-            return jsonify({'message': 'Education updated', 'data': data['education'][education_id].__dict__}), 200
+            return jsonify({'message': 'Education updated', 'data': updated_edu.to_dict()}), 200
         else:
             return jsonify({'error': 'Education not found'}), 404    
 
     if request.method == 'DELETE':
-        if 0 <= education_id < len(data['education']):
-            deleted_education = data['education'].pop(education_id)
-            return jsonify({"message": "Education deleted", "data": deleted_education.__dict__}), 200
+        deleted_education = data['education'].remove(education_id)
+        if deleted_education is not None:
+            record_removed('education', education_id)
+            return jsonify({"message": "Education deleted", "data": deleted_education.to_dict()}), 200
         else:
             return jsonify({"error": "Education not found"}), 404
 
@@ -258,27 +497,14 @@ def skill():
     Handles Skill requests
     '''
     if request.method == 'GET':
-        skills = [{
-            'name': skill.name,
-            'proficiency': skill.proficiency,
-            'logo': get_logo(skill.logo)  # Use helper to get logo or default
-        } for skill in data['skill']]
-        return jsonify(skills), 200
+        return collection_response('skill', Skill.to_dict)
 
     if request.method == 'POST':
-        new_skill = request.json
+        new_skill_obj = SCHEMAS['skill'].decode(request.get_data())
+        skill_id = data['skill'].add(new_skill_obj)
+        record_added('skill', skill_id, new_skill_obj)
         
-        if "name" not in new_skill or "proficiency" not in new_skill or "logo" not in new_skill:
-            return jsonify({"error": "Invalid input, all fields (name, proficiency, logo) are required"}), 400
-        
-        new_skill_obj = Skill(
-            new_skill['name'],
-            new_skill['proficiency'],
-            get_logo(new_skill.get('logo'))  # Use helper to handle missing logo
-        )
-        data['skill'].append(new_skill_obj)
-        
-        return jsonify({'message': 'Skill added', 'data': new_skill_obj.__dict__, 'index': len(data['skill']) - 1}), 201
+        return jsonify({'message': 'Skill added', 'data': new_skill_obj.to_dict(), 'index': skill_id}), 201
 
     return jsonify({}), 400
 
@@ -288,82 +514,220 @@ def skill_at_id(skill_id=None):
     Handles Skill requests at a specific ID
     '''
     if request.method == 'GET':
-        if 0 <= skill_id < len(data['skill']):
-            skill = data['skill'][skill_id]
-            return jsonify({
-                'name': skill.name,
-                'proficiency': skill.proficiency,
-                'logo': get_logo(skill.logo)  # Use helper to get logo or default
-            }), 200
+        skill = data['skill'].get(skill_id)
+        if skill is not None:
+            return jsonify(skill.to_dict()), 200
         else:
             return jsonify({'error': 'Skill not found'}), 404
     
     if request.method == 'PUT':
-        if 0 <= skill_id < len(data['skill']):
-            updated_data = request.get_json()
-
-            name = updated_data.get('name')
-            proficiency = updated_data.get('proficiency')
-            logo = get_logo(updated_data.get('logo'))  # Use helper to handle missing logo
-
-            if not name or not proficiency or not logo:
-                return jsonify({'error': 'Invalid input, all fields (name, proficiency, logo) are required'}), 400
+        if skill_id in data['skill']:
+            updated_skill = SCHEMAS['skill'].decode(request.get_data())
+            if not data['skill'].replace(skill_id, updated_skill):
+                return jsonify({'error': 'Skill not found'}), 404
+            record_updated('skill', skill_id, updated_skill)
 
-            data['skill'][skill_id] = Skill(name, proficiency, logo)
-
-            return jsonify({'message': 'Skill updated', 'data': data['skill'][skill_id].__dict__}), 200
+            return jsonify({'message': 'Skill updated', 'data': updated_skill.to_dict()}), 200
         else:
             return jsonify({'error': 'Skill not found'}), 404    
 
     if request.method == 'DELETE':
-        if 0 <= skill_id < len(data['skill']):
-            deleted_skill = data['skill'].pop(skill_id)
-            return jsonify({"message": "Skill deleted", "data": deleted_skill.__dict__}), 200
+        deleted_skill = data['skill'].remove(skill_id)
+        if deleted_skill is not None:
+            record_removed('skill', skill_id)
+            return jsonify({"message": "Skill deleted", "data": deleted_skill.to_dict()}), 200
         else:
             return jsonify({"error": "Skill not found"}), 404
 
+@app.route('/resume/<any(experience, education, skill):section>:batch', methods=['POST'])
+def batch(section):
+    '''
+    Applies a list of create, update and delete operations to a section
+    atomically. The body is a JSON array or an NDJSON stream of
+    {"op": ..., "id": ..., "data": {...}} items.
+    '''
+    if request.mimetype == 'application/x-ndjson':
+        items = parse_ndjson(request.get_data())
+    else:
+        # Parsed here rather than with request.get_json(), so that any
+        # content type is accepted and invalid JSON gets the JSON 400 body
+        items = decode_json(request.get_data())
+
+    operations, results = validate_operations(items, data[section], SCHEMAS[section])
+    if operations is None:
+        return jsonify({'error': 'Invalid batch, no operation was applied',
+                        'results': results}), 400
+
+    try:
+        ids = data[section].apply(operations)
+    except KeyError:
+        return jsonify({'error': 'A record changed while the batch was applied, '
+                                 'no operation was applied'}), 409
+
+    for result, (op, _, record), record_id in zip(results, operations, ids):
+        if op == 'create':
+            record_added(section, record_id, record)
+        elif op == 'update':
+            record_updated(section, record_id, record)
+        else:
+            record_removed(section, record_id)
+        result.update(id=record_id, status=201 if op == 'create' else 200)
+    return jsonify({'results': results}), 200
+
+@app.route('/resume/search', methods=['GET'])
+def search():
+    '''
+    Returns the records whose text fields contain every word of q, with
+    the fields the words were found in
+    '''
+    query = request.args.get('q', '')
+    if not query.strip():
+        return jsonify({'error': 'q is required'}), 400
+
+    text_index.sync(data)
+    matches = text_index.search(query)
+    results = []
+    for (section, record_id), matched_fields in sorted(matches.items()):
+        record = data[section].get(record_id)
+        if record is not None:
+            results.append({
+                'section': section,
+                'id': record_id,
+                'fields': sorted(matched_fields),
+                'data': record.to_dict()
+            })
+    return jsonify(results), 200
+
 @app.route('/resume/', methods=['GET'])
+@app.route('/resume/spellcheck', methods=['GET'])
 def spellcheck():
     '''
     Checks for spelling errors in Experience, Education, and Skill sections.
     Returns a list of corrections in the specified format.
+
+    Results are cached per record and field by the spellcheck engine, so
+    only the fields changed since the last call are checked again.
+
+    Clients sending Accept: application/x-ndjson get the corrections
+    streamed one per line as each section is checked. The JSON response
+    is cached until a section changes.
+    '''
+    best = request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson'])
+    if best == 'application/x-ndjson':
+        def generate():
+            for correction in spellcheck_engine.iter_corrections(data):
+                yield app.json.dumps(correction) + '\n'
+        return Response(stream_with_context(generate()), 200, mimetype='application/x-ndjson')
+
+    versions = tuple(data[section].version for section in SECTION_MODELS)
+    return cached_response('spellcheck', versions, lambda: spellcheck_engine.corrections(data))
+
+@app.errorhandler(ValidationError)
+def validation_error(error):
+    '''
+    Returns 400 with the same body for every request body that does not
+    match its schema
+    '''
+    return jsonify(error.to_dict()), 400
+
+@app.errorhandler(ShardUnavailable)
+def shard_unavailable(error):
+    '''
+    Returns 503 when the shard owning a user cannot be reached
     '''
-    corrections = []
-
-    # Function to check and collect corrections while preserving case
-    def check_text(text):
-        words = text.split()
-        misspelled = spell.unknown(words)
-        for word in misspelled:
-            correction = spell.correction(word)
-            if correction:
-                # Preserve the case of the original word
-                if word.istitle():
-                    correction = correction.capitalize()
-                elif word.isupper():
-                    correction = correction.upper()
-                else:
-                    # If the word is lowercase or mixed case, keep the correction as is
-                    correction = correction
-                corrections.append({
-                    "before": word,
-                    "after": correction
-                })
-
-    # Check Experience titles, descriptions, and companies
-    for exp in data['experience']:
-        check_text(exp.title)
-        check_text(exp.description)
-        check_text(exp.company)
-
-    # Check Education courses and schools
-    for edu in data['education']:
-        check_text(edu.course)
-        check_text(edu.school)
-
-    # Check Skill names
-    for skill in data['skill']:
-        check_text(skill.name)
-
-    return jsonify(corrections), 200
+    return jsonify({'error': str(error)}), 503
 
+@app.route('/users/<uid>/resume/<any(experience, education, skill):section>',
+           methods=['GET', 'POST'])
+def tenant_section(uid, section):
+    '''
+    Lists or adds the records of a section of a user's resume, on the
+    shard owning the user
+    '''
+    shards = tenant_shards.get()
+    if request.method == 'GET':
+        return jsonify([{'id': record_id, **record.to_dict()}
+                        for record_id, record in shards.call('items', uid, section)]), 200
+
+    record = SCHEMAS[section].decode(request.get_data())
+    return jsonify({'id': str(shards.call('add', uid, section, record))}), 201
+
+@app.route('/users/<uid>/resume/<any(experience, education, skill):section>/<int:record_id>',
+           methods=['GET', 'PUT', 'DELETE'])
+def tenant_record(uid, section, record_id):
+    '''
+    Reads, replaces or deletes a record of a user's resume
+    '''
+    shards = tenant_shards.get()
+    if request.method == 'PUT':
+        record = SCHEMAS[section].decode(request.get_data())
+        if not shards.call('replace', uid, section, record_id, record):
+            record = None
+    elif request.method == 'GET':
+        record = shards.call('get', uid, section, record_id)
+    else:
+        record = shards.call('remove', uid, section, record_id)
+
+    if record is None:
+        return jsonify({'error': 'Record not found'}), 404
+    if request.method == 'DELETE':
+        return jsonify({'message': 'Record deleted', 'data': record.to_dict()}), 200
+    return jsonify(record.to_dict()), 200
+
+@app.route('/users/<uid>/resume/spellcheck', methods=['GET'])
+def tenant_spellcheck(uid):
+    '''
+    Checks the spelling of a user's resume on the shard owning the user
+    '''
+    return jsonify(tenant_shards.get().call('spellcheck', uid, None)), 200
+
+@app.route('/assets', methods=['POST'])
+def upload_asset():
+    '''
+    Stores an uploaded logo, sent as the request body or as the file field
+    of a multipart form, and returns its hash and URL. Uploading an image
+    that is already stored returns the existing asset.
+    '''
+    if request.content_length is not None and request.content_length > ASSET_MAX_BYTES:
+        return jsonify({'error': f'Logos are limited to {ASSET_MAX_BYTES} bytes'}), 413
+    upload = request.files.get('file')
+    content = upload.read(ASSET_MAX_BYTES + 1) if upload else request.get_data()
+    if len(content) > ASSET_MAX_BYTES:
+        return jsonify({'error': f'Logos are limited to {ASSET_MAX_BYTES} bytes'}), 413
+
+    try:
+        digest, created = assets.put(content)
+    except ValueError as error:
+        return jsonify({'error': str(error)}), 400
+    return jsonify({'hash': digest, 'url': assets.url(digest)}), 201 if created else 200
+
+@app.route('/assets/<digest>', methods=['GET'])
+def asset(digest):
+    '''
+    Serves a logo, or its thumbnail with ?size=N. The file is handed to
+    the server's file wrapper, which sends it with sendfile where
+    supported, and thumbnails come from the in-memory cache. Assets never
+    change, so they may be cached for a year.
+    '''
+    found = assets.path(digest)
+    if found is None:
+        return jsonify({'error': 'Asset not found'}), 404
+
+    size = request.args.get('size', type=int)
+    thumbnail = None
+    if 'size' in request.args:
+        if size not in assets.thumbnail_sizes:
+            return jsonify({'error': f'size must be one of {list(assets.thumbnail_sizes)}'}), 400
+        thumbnail = assets.thumbnail(digest, size)
+
+    if thumbnail is None:
+        response = send_file(found[0], mimetype=found[1], etag=digest,
+                             max_age=IMMUTABLE_MAX_AGE, conditional=True)
+    else:
+        response = Response(thumbnail[0], mimetype=thumbnail[1])
+        response.set_etag(f"{digest}-{size}")
+        response.make_conditional(request)
+    response.cache_control.public = True
+    response.cache_control.max_age = IMMUTABLE_MAX_AGE
+    response.cache_control.immutable = True
+    return response
@@ -0,0 +1,200 @@
+'''
+Content-addressed logo assets for the Resume API.
+
+Logos are stored once per distinct content, in files named by the
+SHA-256 of their bytes, so uploading the same image twice returns the
+same asset and its URL never changes meaning. That lets responses be
+cached by clients forever.
+
+Thumbnails are generated with Pillow when it is installed, at upload
+time for the configured sizes, and kept in a bounded in-memory LRU
+cache. Without Pillow the original image is served for every size.
+
+Logo files shipped with the app are registered by digest and served from
+where they are, so nothing is written until a logo is uploaded.
+'''
+import hashlib
+import os
+import re
+from collections import OrderedDict
+from io import BytesIO
+from threading import Lock
+
+ASSET_URL_PREFIX = "/assets/"
+DIGEST = re.compile(r"^[0-9a-f]{64}$")
+
+# (leading bytes, MIME type, file extension) of the accepted image formats
+IMAGE_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "image/png", ".png"),
+    (b"\xff\xd8\xff", "image/jpeg", ".jpg"),
+    (b"GIF87a", "image/gif", ".gif"),
+    (b"GIF89a", "image/gif", ".gif"),
+)
+MIMETYPES = {extension: mimetype for _, mimetype, extension in IMAGE_SIGNATURES}
+MIMETYPES[".webp"] = "image/webp"
+
+
+def sniff_image(content):
+    '''
+    Returns the (MIME type, extension) of an image from its leading
+    bytes, or None when it is not an accepted image format
+    '''
+    for signature, mimetype, extension in IMAGE_SIGNATURES:
+        if content.startswith(signature):
+            return mimetype, extension
+    if content[:4] == b"RIFF" and content[8:12] == b"WEBP":
+        return "image/webp", ".webp"
+    return None
+
+
+def load_pillow():
+    '''
+    Imports Pillow, or returns None when it is not installed
+    '''
+    try:
+        from PIL import Image  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        return None
+    return Image
+
+
+class AssetStore:  # pylint: disable=too-many-instance-attributes
+    '''
+    Stores images under directory as <digest><extension> files and keeps
+    their thumbnails in an LRU cache bounded to cache_bytes.
+
+    Files are written to a temporary name and renamed into place, so
+    worker processes sharing the directory never see a partial asset. The
+    directory is created on the first upload.
+    '''
+
+    def __init__(self, directory, thumbnail_sizes=(64, 128), cache_bytes=16 * 2 ** 20):
+        self.directory = directory
+        self.thumbnail_sizes = tuple(thumbnail_sizes)
+        self.cache_bytes = cache_bytes
+        self.cached_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._thumbnails = OrderedDict()
+        self._lock = Lock()
+        self._pillow = None
+        self._registered = {}
+
+    @staticmethod
+    def url(digest):
+        '''
+        Returns the URL an asset is served from
+        '''
+        return ASSET_URL_PREFIX + digest
+
+    def put(self, content):
+        '''
+        Stores an image and returns (digest, created), created being False
+        when the same content was already stored. Raises ValueError when
+        the content is not an accepted image.
+        '''
+        kind = sniff_image(content)
+        if kind is None:
+            raise ValueError("Logos must be PNG, JPEG, GIF or WebP images")
+        digest = hashlib.sha256(content).hexdigest()
+        path = os.path.join(self.directory, digest + kind[1])
+        if digest in self._registered or os.path.exists(path):
+            return digest, False
+
+        os.makedirs(self.directory, exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, 'wb') as asset:
+            asset.write(content)
+        os.replace(temporary, path)
+        for size in self.thumbnail_sizes:
+            self.thumbnail(digest, size)
+        return digest, True
+
+    def register_file(self, path):
+        '''
+        Serves the image file at path, without copying it, and returns its
+        digest
+        '''
+        with open(path, 'rb') as image:
+            content = image.read()
+        kind = sniff_image(content)
+        if kind is None:
+            raise ValueError(f"{path} is not a PNG, JPEG, GIF or WebP image")
+        digest = hashlib.sha256(content).hexdigest()
+        self._registered[digest] = (path, kind[0])
+        return digest
+
+    def path(self, digest):
+        '''
+        Returns the file path and MIME type of an asset, or None
+        '''
+        if not DIGEST.match(digest):
+            return None
+        if digest in self._registered:
+            return self._registered[digest]
+        for extension, mimetype in MIMETYPES.items():
+            path = os.path.join(self.directory, digest + extension)
+            if os.path.exists(path):
+                return path, mimetype
+        return None
+
+    def _render(self, digest, size):
+        '''
+        Returns the (content, MIME type) of a thumbnail fitting a size x
+        size square, or None when Pillow is not installed
+        '''
+        if self._pillow is None:
+            self._pillow = load_pillow() or False
+        found = self.path(digest)
+        if not self._pillow or found is None:
+            return None
+        with self._pillow.open(found[0]) as image:
+            image_format = image.format
+            image.thumbnail((size, size))
+            output = BytesIO()
+            image.save(output, format=image_format)
+        return output.getvalue(), found[1]
+
+    def thumbnail(self, digest, size):
+        '''
+        Returns the (content, MIME type) of a thumbnail from the cache,
+        rendering it on a miss, or None when it cannot be rendered
+        '''
+        key = (digest, size)
+        with self._lock:
+            if key in self._thumbnails:
+                self._thumbnails.move_to_end(key)
+                self.hits += 1
+                return self._thumbnails[key]
+            self.misses += 1
+
+        # Rendering is slow, so it runs outside the lock
+        thumbnail = self._render(digest, size)
+        if thumbnail is None:
+            return None
+
+        with self._lock:
+            if key not in self._thumbnails:
+                self._thumbnails[key] = thumbnail
+                self.cached_bytes += len(thumbnail[0])
+            while self.cached_bytes > self.cache_bytes and self._thumbnails:
+                _, (content, _) = self._thumbnails.popitem(last=False)
+                self.cached_bytes -= len(content)
+                self.evictions += 1
+        return thumbnail
+
+    def stats(self):
+        '''
+        Returns the thumbnail cache size and its hit, miss and eviction
+        counters
+        '''
+        with self._lock:
+            return {
+                "size": len(self._thumbnails),
+                "bytes": self.cached_bytes,
+                "max_bytes": self.cache_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
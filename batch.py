@@ -0,0 +1,59 @@
+'''
+Batch create/update/delete operations for the Resume API sections
+'''
+from schema import ValidationError, decode_json
+
+OPERATIONS = ("create", "update", "delete")
+
+
+def parse_ndjson(body):
+    '''
+    Returns the items of an NDJSON body, one JSON value per line, or
+    raises ValidationError
+    '''
+    return [decode_json(line) for line in body.splitlines() if line.strip()]
+
+
+def validate_operations(items, collection, schema):
+    '''
+    Validates every item of a batch in one pass.
+
+    Returns (operations, results). operations holds (op, id, record)
+    tuples ready for the collection's apply(). results holds the status
+    of each item; when any item is invalid, operations is None and
+    nothing must be applied.
+    '''
+    if not isinstance(items, list):
+        return None, [{"index": 0, "status": 400, "error": "Expected a list of operations"}]
+
+    operations = []
+    results = []
+    removed = set()
+    failed = False
+    for index, item in enumerate(items):
+        result = {"index": index, "status": 200}
+        op = item.get("op") if isinstance(item, dict) else None
+        record_id = item.get("id") if isinstance(item, dict) else None
+        record = None
+
+        if op not in OPERATIONS:
+            result.update(status=400, error=f"op must be one of {list(OPERATIONS)}")
+        # bool is a subclass of int, but JSON true/false are not IDs
+        elif op != "create" and (not isinstance(record_id, int) or isinstance(record_id, bool)
+                                 or record_id in removed or record_id not in collection):
+            result.update(status=404, error="Record not found")
+        elif op != "delete":
+            try:
+                record = schema.from_dict(item.get("data"))
+            except ValidationError as error:
+                result.update(status=400, error=str(error), fields=error.fields)
+
+        if result["status"] == 200:
+            if op == "delete":
+                removed.add(record_id)
+            operations.append((op, record_id, record))
+        else:
+            failed = True
+        results.append(result)
+
+    return (None if failed else operations), results
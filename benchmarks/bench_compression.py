@@ -0,0 +1,99 @@
+'''
+Response compression benchmark.
+
+First reports, for a collection body of each size, the compressed size
+and the CPU time of gzip and brotli at several levels. Then serves the
+collection through the app and compares the requests per second and the
+bytes sent of uncompressed responses, of variants compressed once per
+version by the response cache, and of projected bodies, which are not
+cached and so are serialized and compressed on every request.
+
+Usage: python benchmarks/bench_compression.py [items] [requests]
+       e.g. python benchmarks/bench_compression.py 100,1000,10000 200
+'''
+import os
+import sys
+import tempfile
+import timeit
+
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+os.environ.setdefault("ASSET_DIRECTORY", tempfile.mkdtemp(prefix="resume-assets-"))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# pylint: disable=wrong-import-position,import-error
+import app as app_module
+from models import Experience
+from response_compression import ENCODINGS, compress
+
+LEVELS = {"gzip": (1, 6, 9), "br": (4, 7, 11)}
+CACHED = '/resume/experience'
+UNCACHED = '/resume/experience?fields=title,company,start_date,end_date,description,logo'
+
+
+def seed(items):
+    '''
+    Replaces the experience section with items records
+    '''
+    collection = app_module.data['experience']
+    for record_id, _ in list(collection.items()):
+        collection.remove(record_id)
+    for i in range(items):
+        collection.add(Experience(f"Software Developer {i}", "A Cool Company", "October 2022",
+                                  "Present", f"Writing Python code for project {i}",
+                                  app_module.DEFAULT_LOGO_URL))
+
+
+def codecs(body):
+    '''
+    Prints the compressed size and compression time of a body for each
+    encoding and level
+    '''
+    for encoding in ENCODINGS:
+        for level in LEVELS[encoding]:
+            levels = (level, level)
+            repeats = max(1, 2 * 2 ** 20 // len(body))
+            seconds = timeit.timeit(lambda e=encoding, l=levels: compress(body, e, l),
+                                    number=repeats) / repeats
+            size = len(compress(body, encoding, levels))
+            print(f"{len(body):>12}{f'{encoding} {level}':>10}{size:>12}"
+                  f"{len(body) / size:>8.1f}{seconds * 1000:>12.3f}")
+
+
+def serve(client, path, requests, encoding=None):
+    '''
+    Returns the requests per second and the bytes of one response for a
+    path, requested with an Accept-Encoding when one is given
+    '''
+    headers = {'Accept-Encoding': encoding} if encoding else {}
+    size = len(client.get(path, headers=headers).get_data())
+    seconds = timeit.timeit(lambda: client.get(path, headers=headers).get_data(),
+                            number=requests)
+    return requests / seconds, size
+
+
+def main():
+    '''
+    Prints the compression trade-off for each collection size
+    '''
+    sizes = [int(size) for size in (sys.argv[1] if len(sys.argv) > 1
+                                    else "100,1000,10000").split(",")]
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    client = app_module.app.test_client()
+
+    print(f"{'body bytes':>12}{'codec':>10}{'bytes':>12}{'ratio':>8}{'cpu ms':>12}")
+    for items in sizes:
+        seed(items)
+        codecs(client.get('/resume/experience').get_data())
+
+    print(f"\n{'items':>8}{'response':>24}{'req/s':>10}{'bytes':>12}")
+    for items in sizes:
+        seed(items)
+        for encoding in (None,) + ENCODINGS:
+            for label, path in (("cached", CACHED), ("per request", UNCACHED)):
+                rate, size = serve(client, path, requests, encoding)
+                label = f"{encoding or 'identity'} {label}"
+                print(f"{items:>8}{label:>24}{rate:>10.0f}{size:>12}")
+
+
+if __name__ == '__main__':
+    main()
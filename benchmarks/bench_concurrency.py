@@ -0,0 +1,100 @@
+# pylint: disable=duplicate-code
+'''
+Concurrent write benchmark for the storage backends.
+
+Runs 1 to 8 writer threads adding records, either all to one section or
+spread across the three sections, while reader threads keep iterating a
+section. Reports writes per second, reader p99 latency, and checks that
+no ID was handed out twice.
+
+Usage: python benchmarks/bench_concurrency.py [writes per thread] [backend]
+'''
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# pylint: disable=wrong-import-position,import-error
+from models import Skill
+from storage import SECTION_MODELS, open_store
+
+SECTIONS = ("experience", "education", "skill")
+
+
+def make_record(section, i):
+    '''
+    Returns a record for a section
+    '''
+    model = SECTION_MODELS[section]
+    if model is Skill:
+        return Skill(f"Python {i}", "1-2 Years", "example-logo.png")
+    return model(f"Title {i}", "A Cool Company", "October 2022", "Present",
+                 f"Description {i}", "example-logo.png")
+
+
+def run(store, writers, writes, spread):  # pylint: disable=too-many-locals
+    '''
+    Returns (writes per second, reader p99 in ms) for one configuration
+    '''
+    ids = {section: [] for section in SECTIONS}
+    latencies = []
+    done = threading.Event()
+
+    def write(number):
+        section = SECTIONS[number % len(SECTIONS)] if spread else "skill"
+        records = [make_record(section, i) for i in range(writes)]
+        added = [store[section].add(record) for record in records]
+        ids[section].extend(added)
+
+    def read():
+        while not done.is_set():
+            start = time.perf_counter()
+            for _ in store["skill"]:
+                pass
+            latencies.append(time.perf_counter() - start)
+
+    readers = [threading.Thread(target=read) for _ in range(2)]
+    threads = [threading.Thread(target=write, args=(n,)) for n in range(writers)]
+    for thread in readers:
+        thread.start()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    for thread in readers:
+        thread.join()
+
+    for section_ids in ids.values():
+        assert len(section_ids) == len(set(section_ids)), "duplicate IDs"
+    p99 = statistics.quantiles(latencies, n=100)[98] * 1000 if len(latencies) > 1 else 0.0
+    return writers * writes / elapsed, p99
+
+
+def main():
+    '''
+    Prints the write throughput per writer count and section layout
+    '''
+    writes = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    backend = sys.argv[2] if len(sys.argv) > 2 else "memory"
+    print(f"{backend} backend, {writes} writes per thread")
+    print(f"{'writers':>8}{'layout':>14}{'writes/s':>12}{'reader p99':>14}")
+    with tempfile.TemporaryDirectory() as directory:
+        for writers in (1, 2, 4, 8):
+            for spread in (False, True):
+                store = open_store(backend, os.path.join(directory, f"{writers}-{spread}.db"))
+                throughput, p99 = run(store, writers, writes, spread)
+                layout = "3 sections" if spread else "1 section"
+                print(f"{writers:>8}{layout:>14}{throughput:>12.0f}{p99:>11.2f} ms")
+                if hasattr(store, "close"):
+                    store.close()
+
+
+if __name__ == '__main__':
+    main()
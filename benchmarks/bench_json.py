@@ -0,0 +1,54 @@
+'''
+JSON serialization micro-benchmark on 10k-item collections.
+
+Compares the previous path (a dict per item, encoded by the standard
+library) with the FastJSONProvider encoding the records directly, with
+and without orjson.
+
+Usage: python benchmarks/bench_json.py [items] [repeats]
+'''
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# pylint: disable=wrong-import-position,import-error
+from flask import Flask
+from json_provider import FastJSONProvider
+from models import Experience
+
+
+def main():
+    '''
+    Prints milliseconds per collection encoding for each path
+    '''
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    records = [Experience(f"Software Developer {i}", "A Cool Company", "October 2022",
+                          "Present", f"Writing Python code for project {i}", "example-logo.png")
+               for i in range(items)]
+    provider = FastJSONProvider(Flask(__name__))
+
+    def stdlib_dicts():
+        return json.dumps([record.to_dict() for record in records],
+                          ensure_ascii=True, sort_keys=True).encode('utf-8')
+
+    def provider_records():
+        return provider.dumps_bytes(records)
+
+    results = {"items": items, "orjson_installed": FastJSONProvider.use_orjson}
+    results["stdlib_dicts_ms"] = timeit.timeit(stdlib_dicts, number=repeats) / repeats * 1000
+    if FastJSONProvider.use_orjson:
+        results["orjson_records_ms"] = (timeit.timeit(provider_records, number=repeats)
+                                        / repeats * 1000)
+    provider.use_orjson = False
+    results["stdlib_records_ms"] = timeit.timeit(provider_records, number=repeats) / repeats * 1000
+
+    print(json.dumps({key: round(value, 2) if isinstance(value, float) else value
+                      for key, value in results.items()}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,406 @@
+'''
+Load benchmark for every resume endpoint.
+
+For each seed size, a fresh interpreter imports the app, seeds every
+section with that many records and serves it on a threaded local server.
+Each scenario is then driven by concurrent keep-alive clients, and its
+p50/p95/p99 latency, requests per second and error count are reported,
+along with the peak RSS of the serving process. The Gemini client is
+replaced by a stub that answers after a fixed delay.
+
+Results are written as JSON, by default to
+benchmarks/results/load-<commit>.json, so runs can be compared across
+commits.
+
+Usage: python benchmarks/bench_load.py [--sizes 100,10000] [--concurrency 8]
+       [--requests 200] [--scenarios list,create] [--backend memory]
+'''
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+SECTIONS = ("experience", "education", "skill")
+WORDS = ("python", "developer", "pipelines", "designed", "maintained", "services",
+         "databases", "deployed", "experiance", "managment", "reliable", "teams")
+
+
+def fake_record(section, i):
+    '''
+    Returns the JSON payload of a generated record, with a few typos so
+    that the spellcheck has work to do
+    '''
+    words = " ".join(WORDS[(i + k) % len(WORDS)] for k in range(8))
+    if section == "experience":
+        return {"title": f"Software Developer {i}", "company": "A Cool Company",
+                "start_date": "October 2022", "end_date": "Present",
+                "description": f"{words} project {i}", "logo": "example-logo.png"}
+    if section == "education":
+        return {"course": f"Computer Science {i}", "school": "University of Tech",
+                "start_date": "September 2019", "end_date": "July 2022",
+                "grade": "80%", "logo": "example-logo.png"}
+    return {"name": f"Python {i}", "proficiency": "1-2 Years", "logo": "example-logo.png"}
+
+
+class StubGemini:  # pylint: disable=too-few-public-methods
+    '''
+    Stands in for the Gemini client, answering after a fixed delay
+    '''
+    model_name = "stub"
+    generation_config = {}
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def generate(self, prompt, max_output_tokens=None):  # pylint: disable=unused-argument
+        '''
+        Returns three suggestions, under one heading per experience for
+        batch prompts
+        '''
+        time.sleep(self.latency)
+        answer = "- Quantify the impact\n- Name the tools used\n- Lead with the result"
+        headings = [line for line in prompt.splitlines() if line.startswith("### Experience ")]
+        if headings:
+            return "\n".join(f"{heading}\n{answer}" for heading in headings)
+        return answer
+
+
+class Context:  # pylint: disable=too-few-public-methods
+    '''
+    IDs available to the scenarios: the seeded records of each section
+    and the records created by the create scenarios
+    '''
+
+    def __init__(self, data):
+        self.ids = {section: list(data[section].keys()) for section in SECTIONS}
+        self.created = {section: [] for section in SECTIONS}
+        self.lock = threading.Lock()
+
+    def random_id(self, section, rng):
+        '''
+        Returns the ID of a random seeded record
+        '''
+        return rng.choice(self.ids[section])
+
+    def take_created(self, section):
+        '''
+        Returns the ID of a record created during the run, or -1
+        '''
+        with self.lock:
+            return self.created[section].pop() if self.created[section] else -1
+
+
+def created_id(body):
+    '''
+    Returns the ID from the body of a create response
+    '''
+    answer = json.loads(body)
+    return int(answer.get('id', answer.get('index', -1)))
+
+
+def section_scenarios(section):
+    '''
+    Returns the CRUD scenarios of a section, as (name, build, on_response)
+    where build returns (method, path, body, headers)
+    '''
+    path = f"/resume/{section}"
+
+    def create(_ctx, rng):
+        return "POST", path, fake_record(section, rng.randrange(10 ** 6)), None
+
+    def remember(ctx, body):
+        with ctx.lock:
+            ctx.created[section].append(created_id(body))
+
+    def update(ctx, rng):
+        return ("PUT", f"{path}/{ctx.random_id(section, rng)}",
+                fake_record(section, rng.randrange(10 ** 6)), None)
+
+    def batch(_ctx, rng):
+        items = [{"op": "create", "data": fake_record(section, rng.randrange(10 ** 6))}
+                 for _ in range(10)]
+        return "POST", f"{path}:batch", items, None
+
+    scenarios = [
+        (f"list_{section}", lambda ctx, rng: ("GET", path, None, None), None),
+        (f"page_{section}", lambda ctx, rng: ("GET", f"{path}?limit=100", None, None), None),
+        (f"create_{section}", create, remember),
+        (f"update_{section}", update, None),
+        (f"batch_{section}", batch, None),
+        (f"delete_{section}",
+         lambda ctx, rng: ("DELETE", f"{path}/{ctx.take_created(section)}", None, None), None),
+    ]
+    if section != "experience":
+        scenarios.insert(2, (f"get_{section}", lambda ctx, rng: (
+            "GET", f"{path}/{ctx.random_id(section, rng)}", None, None), None))
+    return scenarios
+
+
+def all_scenarios():
+    '''
+    Returns every scenario, reads first, in the order they are run
+    '''
+    crud = [scenario for section in SECTIONS for scenario in section_scenarios(section)]
+    reads = [scenario for scenario in crud if scenario[0].split("_")[0] in ("list", "page", "get")]
+    writes = [scenario for scenario in crud if scenario not in reads]
+    return [
+        ("test", lambda ctx, rng: ("GET", "/test", None, None), None),
+        *reads,
+        ("search", lambda ctx, rng: ("GET", "/resume/search?q=python%20developer", None, None),
+         None),
+        ("spellcheck", lambda ctx, rng: ("GET", "/resume/", None, None), None),
+        ("spellcheck_ndjson", lambda ctx, rng: (
+            "GET", "/resume/spellcheck", None, {"Accept": "application/x-ndjson"}), None),
+        ("suggestions", lambda ctx, rng: (
+            "GET", f"/resume/experience/{ctx.random_id('experience', rng)}/suggestions",
+            None, None), None),
+        ("suggestions_batch", lambda ctx, rng: (
+            "POST", "/resume/experience/suggestions",
+            {"ids": [ctx.random_id('experience', rng) for _ in range(5)]}, None), None),
+        *writes,
+        ("spellcheck_after_writes", lambda ctx, rng: ("GET", "/resume/", None, None), None),
+    ]
+
+
+def send(connection, method, path, body, headers):
+    '''
+    Sends one request and returns (status, body)
+    '''
+    headers = dict(headers or {})
+    payload = None
+    if body is not None:
+        payload = json.dumps(body).encode('utf-8')
+        headers["Content-Type"] = "application/json"
+    connection.request(method, path, body=payload, headers=headers)
+    response = connection.getresponse()
+    return response.status, response.read()
+
+
+def run_scenario(port, scenario, ctx, options):  # pylint: disable=too-many-locals
+    '''
+    Drives one scenario with concurrent clients and returns its statistics
+    '''
+    name, build, on_response = scenario
+    latencies = []
+    errors = [0]
+    remaining = [options.requests]
+    lock = threading.Lock()
+
+    def client(client_seed):
+        rng = random.Random(client_seed)
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=600)
+        for _ in range(options.warmup):
+            status, body = send(connection, *build(ctx, rng))
+            if on_response is not None and status < 400:
+                on_response(ctx, body)
+        while True:
+            with lock:
+                if remaining[0] == 0:
+                    break
+                remaining[0] -= 1
+            request = build(ctx, rng)
+            start = time.perf_counter()
+            status, body = send(connection, *request)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                if status >= 400:
+                    errors[0] += 1
+            if on_response is not None and status < 400:
+                on_response(ctx, body)
+        connection.close()
+
+    threads = [threading.Thread(target=client, args=(number,))
+               for number in range(options.concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - start
+
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 \
+        else latencies * 99
+    return {
+        "scenario": name,
+        "requests": len(latencies),
+        "errors": errors[0],
+        "rps": len(latencies) / duration if duration else 0.0,
+        "p50_ms": cuts[49] * 1000,
+        "p95_ms": cuts[94] * 1000,
+        "p99_ms": cuts[98] * 1000,
+    }
+
+
+def seed(data, size, chunk=10000):
+    '''
+    Adds size generated records to every section through batched writes
+    '''
+    # pylint: disable=import-outside-toplevel,import-error
+    from storage import SECTION_MODELS
+    for section in SECTIONS:
+        model = SECTION_MODELS[section]
+        for start in range(0, size, chunk):
+            data[section].apply([("create", None, model(**fake_record(section, i)))
+                                  for i in range(start, min(start + chunk, size))])
+
+
+def run_size(options):
+    '''
+    Seeds the store, serves the app and runs the selected scenarios,
+    returning the results for this seed size
+    '''
+    # pylint: disable=import-outside-toplevel,import-error
+    sys.path.insert(0, ROOT)
+    from werkzeug.serving import WSGIRequestHandler, make_server
+    import app as app_module
+
+    class KeepAliveHandler(WSGIRequestHandler):
+        '''
+        Request handler keeping client connections open between requests
+        '''
+        protocol_version = "HTTP/1.1"
+
+        def log_request(self, *args, **kwargs):
+            pass
+
+    seed_start = time.perf_counter()
+    seed(app_module.data, options.run_size)
+    seed_seconds = time.perf_counter() - seed_start
+
+    app_module.suggestion_service.client = StubGemini(options.llm_latency)
+    if not options.suggestion_cache:
+        app_module.suggestion_service.cache = None
+
+    server = make_server("127.0.0.1", 0, app_module.app, threaded=True,
+                         request_handler=KeepAliveHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    ctx = Context(app_module.data)
+    selected = options.scenarios.split(",") if options.scenarios else None
+    results = []
+    for scenario in all_scenarios():
+        if selected and not any(scenario[0].startswith(prefix) for prefix in selected):
+            continue
+        results.append(run_scenario(server.server_port, scenario, ctx, options))
+        print(f"  {results[-1]['scenario']:<26} done", file=sys.stderr)
+    server.shutdown()
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "size": options.run_size,
+        "seed_seconds": seed_seconds,
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        "peak_rss_bytes": peak_rss if sys.platform == "darwin" else peak_rss * 1024,
+        "scenarios": results,
+    }
+
+
+def git_commit():
+    '''
+    Returns the current commit hash, or None outside a git checkout
+    '''
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_child(size, options, storage_dir):
+    '''
+    Runs one seed size in a fresh interpreter, so its peak RSS is its own
+    '''
+    env = dict(os.environ, STORAGE_BACKEND=options.backend,
+               STORAGE_PATH=os.path.join(storage_dir, f"load-{size}.db"))
+    command = [sys.executable, os.path.abspath(__file__), "--run-size", str(size),
+               "--concurrency", str(options.concurrency), "--requests", str(options.requests),
+               "--warmup", str(options.warmup), "--llm-latency", str(options.llm_latency),
+               "--scenarios", options.scenarios or ""]
+    if options.suggestion_cache:
+        command.append("--suggestion-cache")
+    output = subprocess.run(command, cwd=ROOT, env=env, stdout=subprocess.PIPE, text=True,
+                            check=True).stdout
+    return json.loads(output)
+
+
+def print_results(size_results):
+    '''
+    Prints a table of the results of one seed size
+    '''
+    print(f"\n{size_results['size']} records per section, "
+          f"peak RSS {size_results['peak_rss_bytes'] / 2 ** 20:.1f} MiB")
+    print(f"{'scenario':<26}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for row in size_results["scenarios"]:
+        print(f"{row['scenario']:<26}{row['rps']:>10.1f}{row['p50_ms']:>10.2f}"
+              f"{row['p95_ms']:>10.2f}{row['p99_ms']:>10.2f}{row['errors']:>8}")
+
+
+def parse_args():
+    '''
+    Returns the command line options
+    '''
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--sizes", default="100,1000,10000",
+                        help="comma separated records per section, from 100 to 1000000")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent clients")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--warmup", type=int, default=1,
+                        help="unmeasured requests per client before each scenario")
+    parser.add_argument("--scenarios", default="",
+                        help="comma separated scenario name prefixes, all by default")
+    parser.add_argument("--backend", default="memory", choices=("memory", "sqlite"))
+    parser.add_argument("--llm-latency", type=float, default=0.05,
+                        help="seconds the stubbed Gemini call takes")
+    parser.add_argument("--suggestion-cache", action="store_true",
+                        help="keep the suggestion cache enabled")
+    parser.add_argument("--output", help="JSON results file")
+    parser.add_argument("--run-size", type=int, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main():
+    '''
+    Runs every seed size and saves the results as JSON
+    '''
+    options = parse_args()
+    if options.run_size is not None:
+        print(json.dumps(run_size(options)))
+        return
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "options": {key: value for key, value in vars(options).items()
+                    if key not in ("run_size", "output")},
+        "results": [],
+    }
+    with tempfile.TemporaryDirectory() as storage_dir:
+        for size in (int(size) for size in options.sizes.split(",")):
+            print(f"Running with {size} records per section", file=sys.stderr)
+            report["results"].append(run_child(size, options, storage_dir))
+            print_results(report["results"][-1])
+
+    output = options.output or os.path.join(ROOT, "benchmarks", "results",
+                                            f"load-{(commit or 'local')[:12]}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as results_file:
+        json.dump(report, results_file, indent=2)
+    print(f"\nResults saved to {output}")
+
+
+if __name__ == '__main__':
+    main()
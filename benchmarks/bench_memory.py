@@ -0,0 +1,84 @@
+# pylint: disable=duplicate-code
+'''
+Memory benchmark: bytes per record of the resume models.
+
+Compares plain dataclasses with a per-instance __dict__ (the previous model
+layout) against the slotted, interned models. Field values are built fresh
+for every record, as they are when request bodies are parsed.
+
+Usage: python benchmarks/bench_memory.py [records]
+'''
+import json
+import os
+import sys
+import tracemalloc
+from dataclasses import dataclass
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from models import Experience  # pylint: disable=wrong-import-position,import-error
+
+
+@dataclass
+class DictExperience:
+    '''
+    Experience with the previous plain dataclass layout
+    '''
+    title: str
+    company: str
+    start_date: str
+    end_date: str
+    description: str
+    logo: str
+
+
+def fresh(value):
+    '''
+    Returns a new string object equal to value, like a JSON decoder would
+    '''
+    return json.loads(json.dumps(value))
+
+
+def build(model, count):
+    '''
+    Builds count records with realistic repeated values
+    '''
+    return [model(fresh(f"Software Developer {i % 50}"),
+                  fresh(f"Company {i % 200}"),
+                  fresh("October 2022"),
+                  fresh("Present"),
+                  fresh(f"Writing Python code for project {i}"),
+                  fresh("example-logo.png"))
+            for i in range(count)]
+
+
+def bytes_per_record(model, count):
+    '''
+    Returns the memory allocated per record while building count records
+    '''
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    records = build(model, count)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del records
+    return (after - before) / count
+
+
+def main():
+    '''
+    Prints bytes per record for both layouts
+    '''
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    baseline = bytes_per_record(DictExperience, count)
+    compact = bytes_per_record(Experience, count)
+    print(json.dumps({
+        "records": count,
+        "dict_dataclass_bytes_per_record": round(baseline, 1),
+        "slotted_interned_bytes_per_record": round(compact, 1),
+        "reduction": round(1 - compact / baseline, 3)
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
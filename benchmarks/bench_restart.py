@@ -0,0 +1,107 @@
+# pylint: disable=duplicate-code
+'''
+Restart benchmark for the write-ahead logged memory store.
+
+For each store size (records per section), measures how long reopening
+the store takes when it has to replay the whole log, when it loads a
+snapshot only, and when it loads a snapshot plus a tail of updates.
+Then measures single-record write throughput for each fsync policy.
+
+Usage: python benchmarks/bench_restart.py [sizes] [writes]
+       e.g. python benchmarks/bench_restart.py 1000,10000,100000 2000
+'''
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# pylint: disable=wrong-import-position,import-error
+from models import Skill
+from storage import SECTION_MODELS, DurableMemoryStore
+
+
+def make_record(section, i):
+    '''
+    Returns a record for a section
+    '''
+    model = SECTION_MODELS[section]
+    if model is Skill:
+        return Skill(f"Python {i}", "1-2 Years", "example-logo.png")
+    return model(f"Title {i}", "A Cool Company", "October 2022", "Present",
+                 f"Description {i}", "example-logo.png")
+
+
+def reopen_seconds(path):
+    '''
+    Returns the time taken to open the store at path
+    '''
+    start = time.perf_counter()
+    store = DurableMemoryStore(path, fsync="off", snapshot_every=10 ** 12)
+    elapsed = time.perf_counter() - start
+    store.close()
+    return elapsed
+
+
+def restart_times(directory, size):
+    '''
+    Returns (log only, snapshot only, snapshot and tail) restart times
+    '''
+    path = os.path.join(directory, f"restart-{size}.db")
+    store = DurableMemoryStore(path, fsync="off", snapshot_every=10 ** 12)
+    for section in SECTION_MODELS:
+        for start in range(0, size, 1000):
+            store[section].apply([("create", None, make_record(section, i))
+                                  for i in range(start, min(start + 1000, size))])
+    store.close()
+    log_only = reopen_seconds(path)
+
+    store = DurableMemoryStore(path, fsync="off", snapshot_every=10 ** 12)
+    store.compact()
+    store.close()
+    snapshot_only = reopen_seconds(path)
+
+    store = DurableMemoryStore(path, fsync="off", snapshot_every=10 ** 12)
+    for i in range(0, size, 10):
+        store["skill"].replace(i, make_record("skill", -i))
+    store.close()
+    return log_only, snapshot_only, reopen_seconds(path)
+
+
+def write_throughput(directory, policy, writes):
+    '''
+    Returns single-record adds per second with an fsync policy
+    '''
+    store = DurableMemoryStore(os.path.join(directory, f"writes-{policy}.db"), fsync=policy,
+                               snapshot_every=10 ** 12)
+    records = [make_record("skill", i) for i in range(writes)]
+    start = time.perf_counter()
+    for record in records:
+        store["skill"].add(record)
+    elapsed = time.perf_counter() - start
+    store.close()
+    return writes / elapsed
+
+
+def main():
+    '''
+    Prints restart times per store size and write throughput per policy
+    '''
+    sizes = [int(size) for size in (sys.argv[1] if len(sys.argv) > 1
+                                    else "1000,10000,100000").split(",")]
+    writes = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{'per section':>12}{'log replay':>14}{'snapshot':>14}{'snapshot+10%':>16}")
+        for size in sizes:
+            log_only, snapshot_only, with_tail = restart_times(directory, size)
+            print(f"{size:>12}{log_only * 1000:>11.1f} ms{snapshot_only * 1000:>11.1f} ms"
+                  f"{with_tail * 1000:>13.1f} ms")
+
+        print(f"\n{'fsync':>10}{'writes/s':>14}")
+        for policy in ("always", "batch", "off"):
+            print(f"{policy:>10}{write_throughput(directory, policy, writes):>14.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+'''
+Request body decoding micro-benchmark on a bulk ingest of records.
+
+Compares the previous handler path (request.json then a membership check
+and a model built field by field) with the compiled schemas decoding the
+body straight into the model, with and without msgspec, and with the
+batch path validating already parsed objects.
+
+Usage: python benchmarks/bench_schema.py [bodies] [repeats]
+'''
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# pylint: disable=wrong-import-position,import-error
+from models import Education
+from schema import Schema
+
+FIELDS = ('course', 'school', 'start_date', 'end_date', 'grade', 'logo')
+
+
+def get_logo(logo):
+    '''
+    Resolves a logo like the app does, without loading the app
+    '''
+    return logo or "/assets/default"
+
+
+def main():
+    '''
+    Prints microseconds per decoded body for each path
+    '''
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    bodies = [json.dumps({"course": f"Computer Science {i}", "school": "University of Tech",
+                          "start_date": "September 2019", "end_date": "July 2023",
+                          "grade": "80%", "logo": "example-logo.png"}).encode('utf-8')
+              for i in range(count)]
+    payloads = [json.loads(body) for body in bodies]
+    schema = Schema(Education, get_logo)
+
+    def previous():
+        for body in bodies:
+            payload = json.loads(body)
+            if any(field not in payload for field in FIELDS):
+                raise ValueError('All fields are required')
+            Education(payload['course'], payload['school'], payload['start_date'],
+                      payload['end_date'], payload['grade'], get_logo(payload.get('logo')))
+
+    def schema_decode():
+        for body in bodies:
+            schema.decode(body)
+
+    def schema_from_dict():
+        for payload in payloads:
+            schema.from_dict(payload)
+
+    def per_body(function):
+        return timeit.timeit(function, number=repeats) / repeats / count * 1e6
+
+    results = {"bodies": count, "msgspec_installed": Schema.use_msgspec,
+               "previous_us": per_body(previous)}
+    if Schema.use_msgspec:
+        results["msgspec_decode_us"] = per_body(schema_decode)
+    schema._decoder = None  # pylint: disable=protected-access
+    results["generated_decode_us"] = per_body(schema_decode)
+    results["generated_from_dict_us"] = per_body(schema_from_dict)
+
+    print(json.dumps({key: round(value, 2) if isinstance(value, float) else value
+                      for key, value in results.items()}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+# pylint: disable=duplicate-code
+'''
+Benchmark of the multi-tenant shard processes.
+
+First measures calls per second for 1, 2, 4... shards, driven by as many
+client processes as there are cores, each running threads that add,
+list and spellcheck records of their own users. Then checks tenant
+isolation: while one user's resume with many misspelled words is being
+spellchecked, reports the latency of a light user on the same shard and
+of one on another shard, against a baseline without the heavy user.
+
+Usage: python benchmarks/bench_shards.py [shard counts] [seconds] [heavy words]
+       e.g. python benchmarks/bench_shards.py 1,2,4,8 5 10
+'''
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# pylint: disable=wrong-import-position,import-error
+from models import Experience, Skill
+from shards import ShardCluster, start_shards
+
+THREADS = 4
+TYPOS = ("Pyhton", "Javascrpt", "Sofware", "Enginering", "Managment")
+
+
+def drive(addresses, driver, seconds):
+    '''
+    Runs client threads against the shards for a number of seconds and
+    returns the number of calls made
+    '''
+    cluster = ShardCluster(addresses)
+    deadline = time.perf_counter() + seconds
+    counts = []
+
+    def run(thread):
+        rng = random.Random(f"{driver}-{thread}")
+        calls = 0
+        while time.perf_counter() < deadline:
+            uid = f"user-{driver}-{thread}-{rng.randrange(100)}"
+            cluster.call("add", uid, "skill", Skill(rng.choice(TYPOS), "1-2 Years", "logo.png"))
+            cluster.call("items", uid, "skill")
+            cluster.call("spellcheck", uid, None)
+            calls += 3
+        counts.append(calls)
+
+    threads = [threading.Thread(target=run, args=(number,)) for number in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    cluster.close()
+    return sum(counts)
+
+
+def throughput(count, seconds):
+    '''
+    Returns the calls per second served by count shards
+    '''
+    cluster = start_shards(count)
+    try:
+        # Loads the spell dictionary of every shard before timing
+        users = [f"warmup-{n}" for n in range(10000)]
+        for shard in range(count):
+            cluster.call("spellcheck", next(uid for uid in users
+                                            if cluster.ring.node(uid) == shard), None)
+        drivers = os.cpu_count() or 1
+        with multiprocessing.get_context('spawn').Pool(drivers) as pool:
+            calls = pool.starmap(drive, [(cluster.addresses, driver, seconds)
+                                         for driver in range(drivers)])
+        return sum(calls) / seconds
+    finally:
+        cluster.close()
+
+
+def latencies(cluster, uid, until):
+    '''
+    Returns the latency in milliseconds of light calls for a user, made
+    until the event is set
+    '''
+    times = []
+    while not until.is_set():
+        start = time.perf_counter()
+        cluster.call("items", uid, "skill")
+        cluster.call("spellcheck", uid, None)
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def summary(times):
+    '''
+    Returns the p50, p99 and max of latencies
+    '''
+    p99 = statistics.quantiles(times, n=100)[98] if len(times) > 1 else times[0]
+    return f"{statistics.median(times):>10.2f}{p99:>10.2f}{max(times):>10.2f}"
+
+
+def light_latencies(cluster, uids, work):
+    '''
+    Returns the latencies of light calls made for each user while work
+    runs
+    '''
+    done = threading.Event()
+    results = {}
+
+    def run(uid):
+        results[uid] = latencies(cluster, uid, done)
+
+    threads = [threading.Thread(target=run, args=(uid,)) for uid in uids]
+    for thread in threads:
+        thread.start()
+    work()
+    done.set()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def isolation(words):
+    '''
+    Prints the latency of light users while a heavy spellcheck runs
+    '''
+    cluster = start_shards(2)
+    try:
+        users = [f"user-{n}" for n in range(1000)]
+        heavy = next(uid for uid in users if cluster.ring.node(uid) == 0)
+        same = next(uid for uid in users if cluster.ring.node(uid) == 0 and uid != heavy)
+        other = next(uid for uid in users if cluster.ring.node(uid) == 1)
+        rng = random.Random(7)
+        for _ in range(words):
+            garbage = "".join(rng.choice("bcdfghjklmnpqrstvwxz") for _ in range(9))
+            cluster.call("add", heavy, "experience",
+                         Experience("Developer", "Company", "2020", "2021", garbage, "logo.png"))
+        for uid in (same, other):
+            cluster.call("add", uid, "skill", Skill("Pyhton", "1-2 Years", "logo.png"))
+            cluster.call("spellcheck", uid, None)
+
+        baseline = light_latencies(cluster, (same, other), lambda: time.sleep(1))
+        start = time.perf_counter()
+        during = light_latencies(cluster, (same, other),
+                                 lambda: cluster.call("spellcheck", heavy, None))
+        heavy_seconds = time.perf_counter() - start
+
+        print(f"\n{'light user':>26}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+        for label, results in (("baseline", baseline), ("during heavy", during)):
+            print(f"{label + ', same shard':>26}{summary(results[same])}")
+            print(f"{label + ', other shard':>26}{summary(results[other])}")
+        print(f"heavy spellcheck of {words} misspelled words took {heavy_seconds:.1f} s")
+    finally:
+        cluster.close()
+
+
+def main():
+    '''
+    Prints the shard throughput and the isolation of light users
+    '''
+    counts = [int(count) for count in (sys.argv[1] if len(sys.argv) > 1
+                                       else "1,2,4").split(",")]
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    print(f"{os.cpu_count()} cores")
+    print(f"{'shards':>8}{'calls/s':>12}")
+    for count in counts:
+        print(f"{count:>8}{throughput(count, seconds):>12.0f}")
+    isolation(int(sys.argv[3]) if len(sys.argv) > 3 else 5)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+'''
+Spellcheck backend benchmark.
+
+Builds the symmetric-delete index from the pyspellchecker dictionary,
+then corrects the same misspelled words with both backends, uncached,
+and reports the per-word latency by word length. Long words are where
+pyspellchecker's edit-distance-2 candidate generation is slowest.
+
+Usage: python benchmarks/bench_spellcheck_backends.py [words per length] [index path]
+'''
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# pylint: disable=wrong-import-position,import-error
+from spellcheck import load_spellchecker
+from symspell import SymSpellChecker, build_index
+
+LENGTHS = ((4, 6), (7, 10), (11, 16))
+
+
+def misspell(rng, word):
+    '''
+    Returns the word with one or two random edits
+    '''
+    for _ in range(rng.choice((1, 2))):
+        position = rng.randrange(len(word))
+        letter = rng.choice("abcdefghijklmnopqrstuvwxyz")
+        word = rng.choice((
+            word[:position] + word[position + 1:],
+            word[:position] + letter + word[position + 1:],
+            word[:position] + letter + word[position:],
+            word[:position] + word[position + 1:position + 2] + word[position:position + 1]
+            + word[position + 2:],
+        ))
+    return word
+
+
+def timed_corrections(correct, words):
+    '''
+    Returns the corrections of the words and the time taken by each, in
+    milliseconds
+    '''
+    corrections, times = [], []
+    for word in words:
+        start = time.perf_counter()
+        corrections.append(correct(word))
+        times.append((time.perf_counter() - start) * 1000)
+    return corrections, times
+
+
+def main():  # pylint: disable=too-many-locals
+    '''
+    Prints the index build cost and the per-word latency of each backend
+    '''
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    spell = load_spellchecker()
+    dictionary = spell.word_frequency.dictionary
+    rng = random.Random(42)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = sys.argv[2] if len(sys.argv) > 2 else os.path.join(directory, "symspell.idx")
+        start = time.perf_counter()
+        build_index(path, dictionary)
+        print(f"index built in {time.perf_counter() - start:.1f} s, "
+              f"{os.path.getsize(path) / 2 ** 20:.1f} MiB")
+        start = time.perf_counter()
+        symspell = SymSpellChecker(path)
+        print(f"index opened in {(time.perf_counter() - start) * 1000:.2f} ms\n")
+
+        print(f"{'length':>8}{'backend':>16}{'mean ms':>10}{'p50 ms':>10}{'max ms':>10}"
+              f"{'agree':>8}")
+        for low, high in LENGTHS:
+            words = [word for word in dictionary if low <= len(word) <= high and word.isalpha()]
+            typos = [misspell(rng, rng.choice(words)) for _ in range(count)]
+            results = {name: timed_corrections(correct, typos)
+                       for name, correct in (("pyspellchecker", spell.correction),
+                                             ("symspell", symspell.correction))}
+            # Words of equal frequency are ordered arbitrarily by pyspellchecker
+            agree = sum(mine == theirs or spell[mine or ""] == spell[theirs or ""]
+                        for mine, theirs in zip(results["symspell"][0],
+                                                results["pyspellchecker"][0]))
+            for name, (_, times) in results.items():
+                print(f"{f'{low}-{high}':>8}{name:>16}{statistics.mean(times):>10.3f}"
+                      f"{statistics.median(times):>10.3f}{max(times):>10.3f}"
+                      f"{f'{agree}/{count}':>8}")
+        symspell.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+'''
+Cold start benchmark.
+
+Starts a fresh interpreter per run and measures how long `import app`
+takes and how long until the first /test response, for each PRELOAD mode.
+The first /resume/spellcheck response is timed as well, since that is
+where the lazy mode pays for the spell dictionary.
+
+Usage: python benchmarks/bench_startup.py [runs]
+'''
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+PROBE = '''
+import json, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+client = app.app.test_client()
+client.get('/test')
+first_test = time.perf_counter()
+client.get('/resume/spellcheck')
+first_spellcheck = time.perf_counter()
+print(json.dumps({
+    "import": imported - start,
+    "first_test": first_test - start,
+    "first_spellcheck": first_spellcheck - start
+}))
+'''
+
+
+def measure(mode):
+    '''
+    Returns the timings of one cold start with the given preload mode
+    '''
+    env = dict(os.environ, PRELOAD=mode, STORAGE_BACKEND="memory")
+    output = subprocess.run([sys.executable, "-c", PROBE], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    '''
+    Prints the median timings in milliseconds for each preload mode
+    '''
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print(f"{'mode':<12}{'import app':>14}{'first /test':>14}{'first spellcheck':>18}")
+    for mode in ("lazy", "background", "eager"):
+        samples = [measure(mode) for _ in range(runs)]
+        medians = {key: statistics.median(sample[key] for sample in samples) * 1000
+                   for key in samples[0]}
+        print(f"{mode:<12}{medians['import']:>11.1f} ms{medians['first_test']:>11.1f} ms"
+              f"{medians['first_spellcheck']:>15.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+# pylint: disable=no-member
+
+'''
+Fast JSON provider for the Resume API.
+
+Uses orjson when it is installed and falls back to the standard library
+encoder otherwise. Models are serialized directly, without building an
+intermediate dict per record first.
+'''
+from flask.json.provider import DefaultJSONProvider
+
+from metrics import metrics
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+
+def fast_default(o):
+    '''
+    Serializes objects the encoders do not handle natively, using the
+    model's to_dict() when it has one
+    '''
+    to_dict = getattr(o, 'to_dict', None)
+    if to_dict is not None:
+        return to_dict()
+    return DefaultJSONProvider.default(o)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    '''
+    JSON provider that encodes with orjson when available
+    '''
+
+    default = staticmethod(fast_default)
+    use_orjson = orjson is not None
+
+    def _orjson_options(self):
+        '''
+        Returns the orjson options matching the provider settings
+        '''
+        # orjson's native dataclass support is slower than to_dict() on
+        # slotted dataclasses, so models are handed to default instead
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATACLASS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        return options
+
+    @metrics.timed("json.encode")
+    def dumps_bytes(self, obj):
+        '''
+        Serializes obj to UTF-8 encoded JSON bytes
+        '''
+        if self.use_orjson:
+            return orjson.dumps(obj, default=self.default, option=self._orjson_options())
+        if isinstance(obj, list) and obj and hasattr(obj[0], 'to_dict'):
+            # Converting up front is cheaper than calling default per item
+            obj = [item.to_dict() for item in obj]
+        return super().dumps(obj).encode('utf-8')
+
+    def dumps(self, obj, **kwargs):
+        if self.use_orjson and not kwargs:
+            return self.dumps_bytes(obj).decode('utf-8')
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if self.use_orjson and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            # Pretty printing is only done by the standard library encoder
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj) + b"\n", mimetype=self.mimetype)
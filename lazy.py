@@ -0,0 +1,64 @@
+'''
+Deferred initialization of slow dependencies.
+
+The spell dictionary and the Gemini SDK take a noticeable time to load, so
+they are built on first use instead of at import. A deployment can also
+preload them, either in a background thread while requests are already
+served, or eagerly before the app finishes importing.
+'''
+from threading import Lock, Thread
+
+PRELOAD_MODES = ("lazy", "background", "eager")
+
+
+class Lazy:
+    '''
+    Builds a value from a factory the first time it is requested. The
+    factory runs at most once, even when several threads ask for the value
+    at the same time.
+    '''
+
+    def __init__(self, factory):
+        self.factory = factory
+        self._value = None
+        self._loaded = False
+        self._lock = Lock()
+
+    @property
+    def loaded(self):
+        '''
+        Returns whether the value was built
+        '''
+        return self._loaded
+
+    def get(self):
+        '''
+        Returns the value, building it on first use
+        '''
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._value = self.factory()
+                    self._loaded = True
+        return self._value
+
+
+def preload(mode, loaders):
+    '''
+    Runs the loaders according to the preload mode: not at all ("lazy"),
+    in a daemon thread ("background") or right away ("eager"). Returns the
+    background thread, if one was started.
+    '''
+    if mode not in PRELOAD_MODES:
+        raise ValueError(f"Unknown preload mode {mode!r}, expected one of {PRELOAD_MODES}")
+    if mode == "eager":
+        for loader in loaders:
+            loader()
+    elif mode == "background":
+        def run():
+            for loader in loaders:
+                loader()
+        thread = Thread(target=run, name="preload", daemon=True)
+        thread.start()
+        return thread
+    return None
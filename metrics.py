@@ -0,0 +1,166 @@
+'''
+Request and hot-path timing for the Resume API, exported in the
+Prometheus text format.
+
+Instrumentation is off until enabled, so the timers cost one attribute
+check when it is disabled.
+'''
+from bisect import bisect_left
+from contextlib import nullcontext
+from functools import wraps
+from threading import Lock
+from time import perf_counter
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+NULL_TIMER = nullcontext()
+
+
+def escape_label(value):
+    '''
+    Returns a label value escaped for the Prometheus text format
+    '''
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names, values, extra=()):
+    '''
+    Returns the {name="value",...} label set of a series
+    '''
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in pairs) + "}"
+
+
+class Histogram:
+    '''
+    Prometheus histogram with one series per combination of label values
+    '''
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = Lock()
+
+    def observe(self, value, *labelvalues):
+        '''
+        Records one observation in the series of the label values
+        '''
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def clear(self):
+        '''
+        Drops every series
+        '''
+        with self._lock:
+            self._series.clear()
+
+    def expose(self):
+        '''
+        Returns the histogram in the Prometheus text format
+        '''
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((labels, list(counts), total)
+                            for labels, (counts, total) in self._series.items())
+        for labels, counts, total in series:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                label_set = format_labels(self.labelnames, labels, [("le", bound)])
+                lines.append(f"{self.name}_bucket{label_set} {cumulative}")
+            label_set = format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_set} {total}")
+            lines.append(f"{self.name}_count{label_set} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+class Timer:
+    '''
+    Context manager recording its duration in an operation histogram
+    '''
+
+    __slots__ = ("histogram", "operation", "start")
+
+    def __init__(self, histogram, operation):
+        self.histogram = histogram
+        self.operation = operation
+        self.start = None
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(perf_counter() - self.start, self.operation)
+
+
+class Metrics:
+    '''
+    Holds the request and operation histograms of the process
+    '''
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.requests = Histogram("resume_request_duration_seconds",
+                                  "Time spent handling a request",
+                                  ("method", "endpoint", "status"))
+        self.operations = Histogram("resume_operation_duration_seconds",
+                                    "Time spent in a named hot path",
+                                    ("operation",))
+
+    def timer(self, operation):
+        '''
+        Returns a context manager timing the operation, or a shared no-op
+        one when instrumentation is disabled
+        '''
+        if not self.enabled:
+            return NULL_TIMER
+        return Timer(self.operations, operation)
+
+    def timed(self, operation):
+        '''
+        Decorator timing every call of a function as the operation
+        '''
+        def decorator(function):
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                with Timer(self.operations, operation):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def observe_request(self, method, endpoint, status, seconds):
+        '''
+        Records the duration of a handled request
+        '''
+        self.requests.observe(seconds, method, endpoint or "unmatched", str(status))
+
+    def expose(self):
+        '''
+        Returns every histogram in the Prometheus text format
+        '''
+        return self.requests.expose() + self.operations.expose()
+
+    def clear(self):
+        '''
+        Drops every recorded observation
+        '''
+        self.requests.clear()
+        self.operations.clear()
+
+
+metrics = Metrics()
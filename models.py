@@ -2,12 +2,30 @@
 
 '''
 Models for the Resume API. Each class is related to
+
+Models are frozen, slotted dataclasses: instances have no per-instance
+__dict__, and values repeated across many records (company, school, dates,
+logo paths, proficiency) are interned so every record shares one copy.
 '''
 
 from dataclasses import dataclass
+from sys import intern
+
+
+def intern_fields(record, names):
+    '''
+    Replaces the given string fields of a frozen record by interned copies
+    '''
+    for name in names:
+        value = getattr(record, name)
+        if type(value) is str:  # pylint: disable=unidiomatic-typecheck
+            interned = intern(value)
+            # Values read from a snapshot are already interned
+            if interned is not value:
+                object.__setattr__(record, name, interned)
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Experience:
     '''
     Experience Class
@@ -19,8 +37,24 @@ class Experience:
     description: str
     logo: str
 
+    def __post_init__(self):
+        intern_fields(self, ('title', 'company', 'start_date', 'end_date', 'logo'))
+
+    def to_dict(self):
+        '''
+        Returns the fields of the Experience as a dict
+        '''
+        return {
+            'title': self.title,
+            'company': self.company,
+            'start_date': self.start_date,
+            'end_date': self.end_date,
+            'description': self.description,
+            'logo': self.logo
+        }
 
-@dataclass
+
+@dataclass(frozen=True, slots=True)
 class Education:
     '''
     Education Class
@@ -32,8 +66,24 @@ class Education:
     grade: str
     logo: str
 
+    def __post_init__(self):
+        intern_fields(self, ('course', 'school', 'start_date', 'end_date', 'grade', 'logo'))
+
+    def to_dict(self):
+        '''
+        Returns the fields of the Education as a dict
+        '''
+        return {
+            'course': self.course,
+            'school': self.school,
+            'start_date': self.start_date,
+            'end_date': self.end_date,
+            'grade': self.grade,
+            'logo': self.logo
+        }
+
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Skill:
     '''
     Skill Class
@@ -41,3 +91,16 @@ class Skill:
     name: str
     proficiency: str
     logo: str
+
+    def __post_init__(self):
+        intern_fields(self, ('name', 'proficiency', 'logo'))
+
+    def to_dict(self):
+        '''
+        Returns the fields of the Skill as a dict
+        '''
+        return {
+            'name': self.name,
+            'proficiency': self.proficiency,
+            'logo': self.logo
+        }
@@ -0,0 +1,74 @@
+'''
+Cursor pagination and field projection for the Resume API collections
+'''
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+
+class PaginationError(ValueError):
+    '''
+    Raised for invalid limit, cursor or fields parameters
+    '''
+
+
+def encode_cursor(key):
+    '''
+    Returns an opaque cursor for a record key
+    '''
+    return urlsafe_b64encode(str(key).encode('ascii')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    '''
+    Returns the record key held by a cursor
+    '''
+    try:
+        return int(urlsafe_b64decode(cursor.encode('ascii')).decode('ascii'))
+    except ValueError as error:
+        raise PaginationError('Invalid cursor') from error
+
+
+def parse_limit(value, maximum=1000):
+    '''
+    Returns the limit query parameter as an int between 1 and maximum
+    '''
+    try:
+        limit = int(value)
+    except ValueError as error:
+        raise PaginationError('limit must be an integer') from error
+    if not 1 <= limit <= maximum:
+        raise PaginationError(f'limit must be between 1 and {maximum}')
+    return limit
+
+
+def parse_fields(value, allowed):
+    '''
+    Returns the fields query parameter as a list of allowed field names
+    '''
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in allowed]
+    if not fields or unknown:
+        raise PaginationError(f'fields must be a subset of {list(allowed)}')
+    return fields
+
+
+def paginate(records, limit, cursor=None):
+    '''
+    Returns (ID, record) pairs for the records after cursor, at most limit
+    of them, and the cursor of the next page, or None on the last page.
+
+    Cursors hold the ID of the last record returned. IDs are never reused,
+    so a cursor stays valid while records are inserted or deleted.
+    '''
+    after = decode_cursor(cursor) if cursor else None
+    page = records.page(after, limit + 1)
+    next_cursor = encode_cursor(page[limit - 1][0]) if len(page) > limit else None
+    return page[:limit], next_cursor
+
+
+def project(item, fields):
+    '''
+    Returns only the given fields of a serialized item
+    '''
+    if fields is None:
+        return item
+    return {field: item[field] for field in fields}
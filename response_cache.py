@@ -0,0 +1,65 @@
+'''
+Versioned response cache for the Resume API collections
+'''
+from hashlib import sha1
+from threading import Lock
+
+
+class ResponseCache:
+    '''
+    Caches serialized collection bodies against a per-collection version.
+
+    Store collections bump their version on every write, which makes the
+    cached body stale. Each body is stored with a strong ETag derived from
+    its content, so unchanged collections can be answered with 304.
+    Compressed variants of a body are cached the same way, so each is
+    compressed once per version.
+    '''
+
+    def __init__(self):
+        self._bodies = {}
+        self._variants = {}
+        self._lock = Lock()
+
+    def get(self, collection, version, build):
+        '''
+        Returns (body, etag) for a collection, calling build() to serialize
+        it only when no body is cached for the given version
+        '''
+        cached = self._bodies.get(collection)
+        if cached is not None and cached[0] == version:
+            return cached[1], cached[2]
+
+        body = build()
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        etag = sha1(body).hexdigest()
+        with self._lock:
+            self._bodies[collection] = (version, body, etag)
+        return body, etag
+
+    def get_variant(self, collection, version, build, encoding, compress):
+        '''
+        Returns (body, etag) for a collection encoded with a content
+        coding, calling compress(body, encoding) only when no variant is
+        cached for the given version. Variants get their own strong ETag,
+        since they are different representations.
+        '''
+        key = (collection, encoding)
+        cached = self._variants.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1], cached[2]
+
+        body, etag = self.get(collection, version, build)
+        variant = (version, compress(body, encoding), f"{etag}-{encoding}")
+        with self._lock:
+            self._variants[key] = variant
+        return variant[1], variant[2]
+
+    def clear(self):
+        '''
+        Drops every cached body
+        '''
+        with self._lock:
+            self._bodies.clear()
+            self._variants.clear()
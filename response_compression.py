@@ -0,0 +1,111 @@
+# pylint: disable=no-member
+'''
+Response compression for the Resume API.
+
+The content coding of a response is negotiated from Accept-Encoding:
+brotli when the brotli package is installed and the client accepts it,
+then gzip. Bodies smaller than min_size are sent as they are, since
+compressing them saves less than the CPU it costs.
+
+Bodies that are cached, such as the collections, are compressed at a
+high level once per version by the response cache. Other bodies are
+compressed per request at a fast level, and streamed bodies are
+compressed chunk by chunk, each chunk being flushed so that clients get
+every line as soon as it is produced.
+'''
+import gzip
+import zlib
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+# Content codings in order of preference
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+COMPRESSIBLE_MIMETYPES = frozenset(("application/json", "application/x-ndjson"))
+
+# (gzip level, brotli quality) of cached bodies, compressed once per
+# version, and of bodies compressed on every request or streamed. Higher
+# brotli qualities cost several times the CPU for a few percent at best.
+CACHED_LEVELS = (9, 7)
+DYNAMIC_LEVELS = (1, 4)
+
+
+def compressible(mimetype):
+    '''
+    Returns whether responses of a MIME type are worth compressing
+    '''
+    return mimetype in COMPRESSIBLE_MIMETYPES or mimetype.startswith("text/")
+
+
+def compress(body, encoding, levels=CACHED_LEVELS):
+    '''
+    Returns a body compressed with a content coding
+    '''
+    if encoding == "br":
+        return brotli.compress(body, quality=levels[1])
+    # A fixed mtime keeps the output, and so its ETag, the same for a body
+    return gzip.compress(body, compresslevel=levels[0], mtime=0)
+
+
+def compress_stream(chunks, encoding, levels=DYNAMIC_LEVELS):
+    '''
+    Yields the compressed chunks of a streamed body, flushing the
+    compressor after each one
+    '''
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=levels[1])
+        process, flush, finish = compressor.process, compressor.flush, compressor.finish
+    else:
+        # wbits=31 writes a gzip header and trailer around the deflate stream
+        compressor = zlib.compressobj(levels[0], zlib.DEFLATED, 31)
+        process, finish = compressor.compress, compressor.flush
+        flush = lambda: compressor.flush(zlib.Z_SYNC_FLUSH)  # pylint: disable=unnecessary-lambda-assignment
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        if chunk:
+            yield process(chunk) + flush()
+    yield finish()
+
+
+class ResponseCompressor:
+    '''
+    Negotiates the content coding of responses and compresses the ones
+    that were not already compressed from a cache
+    '''
+
+    def __init__(self, min_size=1024, encodings=ENCODINGS):
+        self.min_size = min_size
+        self.encodings = tuple(encodings)
+
+    def negotiate(self, accept_encodings):
+        '''
+        Returns the preferred content coding accepted by a request, or
+        None when the body should be sent as it is
+        '''
+        return accept_encodings.best_match(self.encodings)
+
+    def compress_response(self, response, encoding):
+        '''
+        Compresses a response in place with a content coding. Small,
+        already encoded and non-text responses are left unchanged.
+        '''
+        if response.direct_passthrough or not compressible(response.mimetype or ""):
+            return response
+        response.vary.add("Accept-Encoding")
+        if (encoding is None or response.status_code != 200
+                or "Content-Encoding" in response.headers):
+            return response
+
+        if response.is_streamed:
+            response.response = compress_stream(response.response, encoding)
+            response.headers.pop("Content-Length", None)
+        else:
+            body = response.get_data()
+            if len(body) < self.min_size:
+                return response
+            response.set_data(compress(body, encoding, DYNAMIC_LEVELS))
+        response.headers["Content-Encoding"] = encoding
+        return response
@@ -0,0 +1,159 @@
+# pylint: disable=no-member
+
+'''
+Request body schemas compiled from the dataclasses in models.py.
+
+Every field of a model must be a non-empty string, except logo, which is
+optional and resolved by the get_logo function given to the schema.
+Unknown keys are ignored.
+
+A body is decoded and validated in one pass: by msgspec when it is
+installed, and otherwise by a function generated from the model's fields,
+which reads each field once and checks its type inline. Invalid bodies
+raise ValidationError, which the app turns into the same 400 body
+wherever it is raised.
+'''
+from dataclasses import fields
+from typing import Annotated
+
+try:
+    import msgspec
+except ImportError:  # pragma: no cover - depends on the environment
+    msgspec = None
+
+try:
+    from orjson import loads
+except ImportError:  # pragma: no cover - depends on the environment
+    from json import loads
+
+
+class ValidationError(ValueError):
+    '''
+    Raised when a request body does not match its schema
+    '''
+
+    def __init__(self, message, invalid=()):
+        super().__init__(message)
+        self.fields = list(invalid)
+
+    def to_dict(self):
+        '''
+        Returns the error body of the response
+        '''
+        return {'error': str(self), 'fields': self.fields}
+
+
+def invalid_fields(names, values):
+    '''
+    Returns the names of the values that are not non-empty strings
+    '''
+    return [name for name, value in zip(names, values)
+            if type(value) is not str or not value]  # pylint: disable=unidiomatic-typecheck
+
+
+def decode_json(body):
+    '''
+    Returns the value encoded by a JSON body, or raises ValidationError
+    '''
+    try:
+        return loads(body)
+    except (ValueError, TypeError) as error:
+        raise ValidationError('Invalid JSON') from error
+
+
+def generate(name, lines, namespace):
+    '''
+    Compiles the source lines of a function and returns it
+    '''
+    exec(compile("\n".join(lines), f"<schema {name}>", "exec"),  # pylint: disable=exec-used
+         namespace)
+    return namespace[name]
+
+
+def compile_builder(model, get_logo=None):
+    '''
+    Returns a function building a model instance from a decoded JSON
+    object, generated so that every field is checked without a loop
+    '''
+    names = [field.name for field in fields(model)]
+    variables = [f"value_{name}" for name in names]
+    lines = [
+        "def build(payload):",
+        "    if type(payload) is not dict:",
+        "        raise ValidationError('Expected a JSON object')",
+        "    get = payload.get",
+    ]
+    lines += [f"    {variable} = get({name!r})" for name, variable in zip(names, variables)]
+    if get_logo is not None and "logo" in names:
+        lines += [
+            "    if not value_logo or type(value_logo) is str:",
+            "        value_logo = get_logo(value_logo)",
+        ]
+    checks = " or ".join(f"type({variable}) is not str or not {variable}"
+                         for variable in variables)
+    lines += [
+        f"    if {checks}:",
+        f"        invalid = invalid_fields(NAMES, ({', '.join(variables)},))",
+        "        raise ValidationError(f'Missing or invalid fields: {invalid}', invalid)",
+        f"    return model({', '.join(variables)})",
+    ]
+    return generate("build", lines, {
+        "ValidationError": ValidationError,
+        "invalid_fields": invalid_fields,
+        "NAMES": tuple(names),
+        "model": model,
+        "get_logo": get_logo,
+    })
+
+
+def compile_decoder(model, get_logo=None):
+    '''
+    Returns a function decoding JSON bytes into a model instance with
+    msgspec. The body is decoded as a struct whose fields are non-empty
+    strings, except logo when get_logo is given, which defaults to "".
+    '''
+    optional = ("logo",) if get_logo is not None else ()
+    required = Annotated[str, msgspec.Meta(min_length=1)]
+    struct = msgspec.defstruct(
+        f"{model.__name__}Body",
+        [(field.name, str, "") if field.name in optional else (field.name, required)
+         for field in fields(model)])
+    values = [f"get_logo(body.{field.name})" if field.name in optional else f"body.{field.name}"
+              for field in fields(model)]
+    return generate("decode", [
+        "def decode(content):",
+        "    body = decoder.decode(content)",
+        f"    return model({', '.join(values)})",
+    ], {
+        "decoder": msgspec.json.Decoder(struct),
+        "model": model,
+        "get_logo": get_logo,
+    })
+
+
+class Schema:  # pylint: disable=too-few-public-methods
+    '''
+    Decodes request bodies into instances of a model
+    '''
+
+    use_msgspec = msgspec is not None
+
+    def __init__(self, model, get_logo=None):
+        self.model = model
+        self.from_dict = compile_builder(model, get_logo)
+        self._decoder = compile_decoder(model, get_logo) if self.use_msgspec else None
+
+    def decode(self, body):
+        '''
+        Returns the model instance encoded by a JSON request body, or
+        raises ValidationError
+        '''
+        if self._decoder is not None:
+            try:
+                return self._decoder(body)
+            except (msgspec.DecodeError, msgspec.ValidationError):
+                # The generic path below reports the error in the same
+                # format as without msgspec
+                pass
+
+        return self.from_dict(decode_json(body))
@@ -0,0 +1,312 @@
+'''
+Multi-tenant resume store partitioned across shard processes.
+
+Each user's resume lives in exactly one shard process, chosen by
+consistent hashing of the user ID, so adding a shard only moves the users
+of the ring segments it takes over. Shards own their users' records and
+spellcheck caches, and the front end calls them over Unix sockets with
+multiprocessing.connection.
+
+A shard serves every connection from its own thread, and the front end
+opens one connection per concurrent request, so a slow call such as a
+large spellcheck only holds up the requests of the same user; other users
+of the shard keep being served, and users of other shards are served by
+other processes and cores.
+
+Shards are started by the app on first use, or separately with
+python shards.py, in which case the front ends are given their socket
+addresses. Only one process of a deployment may start shards, which a
+lock file enforces, so deployments with several app workers must run
+python shards.py. Shards keep their users' records in memory only, so
+they are lost when the shards stop.
+'''
+import argparse
+import fcntl
+import hashlib
+import multiprocessing
+import os
+import tempfile
+import threading
+from bisect import bisect
+from multiprocessing.connection import Client, Listener
+
+from lazy import Lazy
+from spellcheck import CachedSpellChecker, SpellcheckEngine, spellchecker_loader
+from storage import MemoryStore
+
+SHARD_OPERATIONS = ("items", "get", "add", "replace", "remove", "spellcheck")
+
+
+class ShardUnavailable(Exception):
+    '''
+    Raised when a shard process cannot be reached
+    '''
+
+
+def ring_point(key):
+    '''
+    Returns the position of a key on the hash ring
+    '''
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class HashRing:  # pylint: disable=too-few-public-methods
+    '''
+    Consistent hash ring placing each node at replicas points, so keys
+    spread evenly and only about 1/N of them move when a node is added
+    '''
+
+    def __init__(self, nodes, replicas=128):
+        if not nodes:
+            raise ValueError("A hash ring needs at least one node")
+        points = sorted((ring_point(f"{node}#{replica}"), node)
+                        for node in nodes for replica in range(replicas))
+        self._points = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def node(self, key):
+        '''
+        Returns the node owning a key
+        '''
+        return self._nodes[bisect(self._points, ring_point(key)) % len(self._points)]
+
+
+class Shard:
+    '''
+    The users of one shard, each with their own store and spellcheck
+    engine. The spell checker and its correction cache are shared by the
+    users of the shard.
+    '''
+
+    def __init__(self, spell):
+        self.spell = spell
+        self._tenants = {}
+        self._lock = threading.Lock()
+
+    def tenant(self, uid):
+        '''
+        Returns the (store, spellcheck engine) of a user, creating them on
+        first use
+        '''
+        tenant = self._tenants.get(uid)
+        if tenant is None:
+            with self._lock:
+                tenant = self._tenants.setdefault(
+                    uid, (MemoryStore(), SpellcheckEngine(self.spell)))
+        return tenant
+
+    def handle(self, operation, uid, section, *args):
+        '''
+        Runs one operation on the store of a user and returns its result
+        '''
+        if operation not in SHARD_OPERATIONS:
+            raise ValueError(f"Unknown shard operation {operation!r}")
+        store, engine = self.tenant(uid)
+        if operation == "spellcheck":
+            return engine.corrections(store)
+        collection = store[section]
+        if operation == "items":
+            return list(collection.items())
+        if operation == "get":
+            return collection.get(*args)
+        if operation == "add":
+            return collection.add(*args)
+        if operation == "replace":
+            return collection.replace(*args)
+        return collection.remove(*args)
+
+
+def serve_connection(shard, connection):
+    '''
+    Answers the calls of one front end connection until it is closed.
+    Each call is (operation, uid, section, *args) and each answer is
+    (True, result) or (False, exception).
+    '''
+    with connection:
+        while True:
+            try:
+                call = connection.recv()
+            except (EOFError, OSError):
+                return
+            try:
+                answer = (True, shard.handle(*call))
+            except (KeyError, TypeError, ValueError) as error:
+                answer = (False, error)
+            connection.send(answer)
+
+
+def run_shard(address, loader, ready=None):
+    '''
+    Serves a shard on a Unix socket until the process is stopped
+    '''
+    shard = Shard(CachedSpellChecker(Lazy(loader)))
+    with Listener(address, family='AF_UNIX') as listener:
+        if ready is not None:
+            ready.set()
+        while True:
+            connection = listener.accept()
+            threading.Thread(target=serve_connection, args=(shard, connection),
+                             name="shard-connection", daemon=True).start()
+
+
+class ShardClient:
+    '''
+    Calls one shard, reusing idle connections so that concurrent requests
+    each get their own connection
+    '''
+
+    def __init__(self, address):
+        self.address = address
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def call(self, *call):
+        '''
+        Sends a call to the shard and returns its result
+        '''
+        with self._lock:
+            connection = self._idle.pop() if self._idle else None
+        try:
+            if connection is None:
+                connection = Client(self.address, family='AF_UNIX')
+            connection.send(call)
+            ok, result = connection.recv()
+        except (EOFError, OSError) as error:
+            if connection is not None:
+                connection.close()
+            raise ShardUnavailable(f"Shard at {self.address} is unavailable") from error
+        with self._lock:
+            self._idle.append(connection)
+        if not ok:
+            raise result
+        return result
+
+    def close(self):
+        '''
+        Closes the idle connections
+        '''
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+
+class ShardCluster:
+    '''
+    Routes the calls for each user to the shard owning them
+    '''
+
+    def __init__(self, addresses, replicas=128):
+        self.addresses = list(addresses)
+        self.clients = [ShardClient(address) for address in self.addresses]
+        self.ring = HashRing(range(len(self.clients)), replicas)
+        self.processes = []
+        self.lock = None
+
+    def shard_for(self, uid):
+        '''
+        Returns the client of the shard owning a user
+        '''
+        return self.clients[self.ring.node(uid)]
+
+    def call(self, operation, uid, section, *args):
+        '''
+        Runs an operation on a section of the store of a user, on the
+        shard owning them
+        '''
+        return self.shard_for(uid).call(operation, uid, section, *args)
+
+    def close(self):
+        '''
+        Closes the connections and stops the shards started by start_shards
+        '''
+        for client in self.clients:
+            client.close()
+        for process in self.processes:
+            process.terminate()
+            process.join()
+        self.processes = []
+        if self.lock is not None:
+            self.lock.close()
+            self.lock = None
+
+
+def claim_shards(path):
+    '''
+    Takes an exclusive lock on the file at path for as long as the
+    returned file stays open, or raises ShardUnavailable when another
+    process holds it
+    '''
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    lock = open(path, 'a', encoding='utf-8')  # pylint: disable=consider-using-with
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError as error:
+        lock.close()
+        raise ShardUnavailable(
+            f"Shards were already started by another process holding {path}; deployments "
+            "with several app workers must run python shards.py and set SHARD_ADDRESSES"
+        ) from error
+    return lock
+
+
+def start_shards(count, directory=None, loader=None, timeout=30, lock_path=None):
+    '''
+    Starts count shard processes listening on sockets in directory, a
+    private temporary directory by default, and returns a cluster routing
+    to them. When lock_path is given, the shards are only started if no
+    other process holds that lock, and the cluster holds it until closed.
+    '''
+    lock = claim_shards(lock_path) if lock_path else None
+    directory = directory or tempfile.mkdtemp(prefix="resume-shards-")
+    loader = loader or spellchecker_loader()
+    # Shards are spawned, not forked, since the front end runs threads
+    context = multiprocessing.get_context('spawn')
+    processes = []
+    addresses = []
+    for number in range(count):
+        address = os.path.join(directory, f"shard-{number}.sock")
+        ready = context.Event()
+        process = context.Process(target=run_shard, args=(address, loader, ready),
+                                  name=f"shard-{number}", daemon=True)
+        process.start()
+        processes.append((process, ready))
+        addresses.append(address)
+    for process, ready in processes:
+        if not ready.wait(timeout):
+            for started, _ in processes:
+                started.terminate()
+            if lock is not None:
+                lock.close()
+            raise ShardUnavailable(f"{process.name} did not start within {timeout} s")
+
+    cluster = ShardCluster(addresses)
+    cluster.processes = [process for process, _ in processes]
+    cluster.lock = lock
+    return cluster
+
+
+def main():
+    '''
+    Runs shard processes in the foreground for front ends started with
+    SHARD_ADDRESSES
+    '''
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n", maxsplit=1)[0])
+    parser.add_argument("--count", type=int, default=os.cpu_count(),
+                        help="number of shard processes")
+    parser.add_argument("--directory", help="directory of the shard sockets")
+    args = parser.parse_args()
+
+    cluster = start_shards(args.count, args.directory,
+                           spellchecker_loader(os.getenv("SPELLCHECK_BACKEND", "pyspellchecker"),
+                                               os.getenv("SYMSPELL_INDEX_PATH", "symspell.idx")))
+    print(f"SHARD_ADDRESSES={','.join(cluster.addresses)}", flush=True)
+    try:
+        for process in cluster.processes:
+            process.join()
+    except KeyboardInterrupt:
+        cluster.close()
+
+
+if __name__ == '__main__':
+    main()
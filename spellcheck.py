@@ -0,0 +1,432 @@
+'''
+Incremental spellcheck engine for the Resume API
+'''
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from threading import Lock
+
+from lazy import Lazy
+from metrics import metrics
+from symspell import StaleIndex, SymSpellChecker, build_index
+
+SPELLCHECK_FIELDS = {
+    "experience": ("title", "description", "company"),
+    "education": ("course", "school"),
+    "skill": ("name",),
+}
+
+SPELLCHECK_BACKENDS = ("pyspellchecker", "symspell")
+
+
+def load_spellchecker():
+    '''
+    Imports pyspellchecker and loads its English dictionary
+    '''
+    from spellchecker import SpellChecker  # pylint: disable=import-outside-toplevel
+    return SpellChecker()
+
+
+def load_symspell(path):
+    '''
+    Opens the symmetric-delete index at path, building it from the
+    pyspellchecker dictionary first when it is missing or stale
+    '''
+    try:
+        return SymSpellChecker(path)
+    except (FileNotFoundError, StaleIndex):
+        build_index(path, load_spellchecker().word_frequency.dictionary)
+    return SymSpellChecker(path)
+
+
+def spellchecker_loader(backend="pyspellchecker", index_path="symspell.idx"):
+    '''
+    Returns the function loading the spell checker of a backend
+    '''
+    if backend not in SPELLCHECK_BACKENDS:
+        raise ValueError(f"Unknown spellcheck backend {backend!r}, "
+                         f"expected one of {SPELLCHECK_BACKENDS}")
+    if backend == "symspell":
+        return partial(load_symspell, index_path)
+    return load_spellchecker
+
+
+class CachedSpellChecker:
+    '''
+    Wraps a SpellChecker with a bounded LRU cache around correction().
+
+    The cache is shared by every request in the process, so a typo seen
+    in many records is only corrected once. The spell checker may be given
+    as a Lazy, in which case its dictionary is loaded on first use.
+    '''
+
+    def __init__(self, spell, maxsize=10000):
+        self._spell = spell
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._cache = OrderedDict()
+        self._lock = Lock()
+
+    @property
+    def spell(self):
+        '''
+        Returns the wrapped spell checker, loading it if it is lazy
+        '''
+        if isinstance(self._spell, Lazy):
+            return self._spell.get()
+        return self._spell
+
+    @property
+    def loaded(self):
+        '''
+        Returns whether the dictionary of the spell checker is loaded
+        '''
+        return not isinstance(self._spell, Lazy) or self._spell.loaded
+
+    def unknown(self, words):
+        '''
+        Returns the subset of words missing from the dictionary
+        '''
+        return self.spell.unknown(words)
+
+    def correction(self, word):
+        '''
+        Returns the most probable correction for word
+        '''
+        found, correction = self._lookup(word)
+        if found:
+            return correction
+
+        # Candidate generation is slow, so it runs outside the lock
+        correction = self.spell.correction(word)
+        self._store(word, correction)
+        return correction
+
+    def _lookup(self, word):
+        '''
+        Returns (True, correction) when the correction of a word is cached,
+        or (False, None), counting the hit or miss
+        '''
+        with self._lock:
+            if word in self._cache:
+                self._cache.move_to_end(word)
+                self.hits += 1
+                return True, self._cache[word]
+            self.misses += 1
+        return False, None
+
+    def _store(self, word, correction):
+        '''
+        Caches the correction of a word, evicting the least recently used
+        '''
+        with self._lock:
+            self._cache[word] = correction
+            self._cache.move_to_end(word)
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+                self.evictions += 1
+
+    def warmup(self, words, spell=None):
+        '''
+        Fills the cache with the corrections of the misspelled words. A
+        spell checker given explicitly is used instead of the wrapped one,
+        so that a lazy dictionary can be warmed while it is being loaded.
+        '''
+        spell = self.spell if spell is None else spell
+        for word in spell.unknown(words):
+            if not self._lookup(word)[0]:
+                self._store(word, spell.correction(word))
+
+    def warmup_from_file(self, path, spell=None):
+        '''
+        Fills the cache from a file holding whitespace separated words
+        '''
+        with open(path, encoding='utf-8') as word_list:
+            self.warmup(word_list.read().split(), spell)
+
+    def stats(self):
+        '''
+        Returns the cache size and its hit, miss and eviction counters
+        '''
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._cache),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+    def clear(self):
+        '''
+        Drops every cached correction and resets the counters
+        '''
+        with self._lock:
+            self._cache.clear()
+            self.hits = self.misses = self.evictions = 0
+
+
+def match_case(word, correction):
+    '''
+    Returns the correction with the casing of the original word
+    '''
+    if word.istitle():
+        return correction.capitalize()
+    if word.isupper():
+        return correction.upper()
+    # If the word is lowercase or mixed case, keep the correction as is
+    return correction
+
+
+def check_texts(spell, texts):
+    '''
+    Returns the corrections for each text, in order of first appearance
+    within the text. Every distinct word is looked up once across all the
+    texts, however often it occurs.
+    '''
+    with metrics.timer("spellcheck.tokenize"):
+        split_texts = [text.split() for text in texts]
+        distinct = {word.lower() for words in split_texts for word in words}
+    with metrics.timer("spellcheck.unknown"):
+        misspelled = spell.unknown(distinct)
+    with metrics.timer("spellcheck.correction"):
+        corrections_by_word = {word: spell.correction(word) for word in misspelled}
+
+    results = []
+    for words in split_texts:
+        corrections = []
+        seen = set()
+        for word in words:
+            key = word.lower()
+            if key not in misspelled or key in seen:
+                continue
+            seen.add(key)
+            correction = corrections_by_word[key]
+            if correction:
+                corrections.append({
+                    "before": word,
+                    "after": match_case(word, correction)
+                })
+        results.append(corrections)
+    return results
+
+
+def check_text(spell, text):
+    '''
+    Returns the corrections for every misspelled word in text, in order
+    of first appearance
+    '''
+    return check_texts(spell, [text])[0]
+
+
+_worker_spell = None  # pylint: disable=invalid-name
+
+
+def _init_worker(loader, cache_size):
+    '''
+    Loads the spell checker once per pool worker
+    '''
+    global _worker_spell  # pylint: disable=global-statement
+    _worker_spell = CachedSpellChecker(loader(), maxsize=cache_size)
+
+
+def _check_chunk(texts):
+    '''
+    Checks a chunk of texts inside a pool worker
+    '''
+    return check_texts(_worker_spell, texts)
+
+
+def record_items(records):
+    '''
+    Returns (ID, record) pairs for a store collection or a plain list
+    '''
+    if hasattr(records, 'items'):
+        return records.items()
+    return enumerate(records)
+
+
+class SpellcheckEngine:  # pylint: disable=too-many-instance-attributes
+    '''
+    Keeps spellcheck results per record and per field so that only the
+    fields changed since the last check are checked again.
+
+    The write handlers report changes through record_added, record_updated
+    and record_removed. Each cached field also remembers the text it was
+    computed from, so a field is only re-checked when its text changed.
+    Checks hold a lock, while the write handlers only drop the memoized
+    response and never wait for a check in progress.
+
+    When workers is set and at least parallel_threshold fields need to be
+    checked, they are split into chunks of chunk_size texts and checked
+    across a process pool. Smaller batches are checked serially. Each
+    worker loads its own spell checker with loader, so the symspell
+    backend shares its memory-mapped index between the workers.
+    '''
+
+    def __init__(self, spell, fields=None, workers=0, chunk_size=64,  # pylint: disable=R0913,R0917
+                 parallel_threshold=256, worker_cache_size=10000, loader=load_spellchecker):
+        self.spell = spell
+        self.fields = fields or SPELLCHECK_FIELDS
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.parallel_threshold = parallel_threshold
+        self.worker_cache_size = worker_cache_size
+        self.loader = loader
+        self._pool = None
+        self._results = {section: {} for section in self.fields}
+        self._response = None
+        self._versions = None
+        self._lock = Lock()
+
+    def record_added(self, section, record_id):  # pylint: disable=unused-argument
+        '''
+        Called after a record was added to a section
+        '''
+        self._response = None
+
+    def record_updated(self, section, record_id):  # pylint: disable=unused-argument
+        '''
+        Called after the record with an ID was replaced
+        '''
+        # Entries are validated field by field on the next check, so
+        # unchanged fields keep their cached corrections.
+        self._response = None
+
+    def record_removed(self, section, record_id):  # pylint: disable=unused-argument
+        '''
+        Called after the record with an ID was removed from a section
+        '''
+        # The entry is pruned on the next check, which holds the lock, so
+        # writers never wait for a check in progress
+        self._response = None
+
+    def _entries(self, section, records):
+        '''
+        Returns the cache entries of a section in record order, paired
+        with their records
+        '''
+        results = self._results[section]
+        items = list(record_items(records))
+        entries = [(results.setdefault(record_id, {}), record) for record_id, record in items]
+        if len(results) > len(entries):
+            # Entries of removed records are left behind until here
+            live = {record_id for record_id, _ in items}
+            for record_id in [record_id for record_id in results if record_id not in live]:
+                del results[record_id]
+        return entries
+
+    def _stale_fields(self, section, entries):
+        '''
+        Returns (entry, field, text) for every field whose cached
+        corrections are missing or were computed from another text
+        '''
+        stale = []
+        for entry, record in entries:
+            for field in self.fields[section]:
+                text = getattr(record, field)
+                cached = entry.get(field)
+                if cached is None or cached[0] != text:
+                    stale.append((entry, field, text))
+        return stale
+
+    def _check_texts(self, texts):
+        '''
+        Checks texts serially or across the process pool, keeping order
+        '''
+        if not self.workers or len(texts) < self.parallel_threshold:
+            return check_texts(self.spell, texts)
+
+        if self._pool is None:
+            # Workers are spawned, not forked, since the app runs threads
+            # whose locks a forked child could inherit held
+            self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                             mp_context=multiprocessing.get_context('spawn'),
+                                             initializer=_init_worker,
+                                             initargs=(self.loader, self.worker_cache_size))
+        chunks = [texts[i:i + self.chunk_size]
+                  for i in range(0, len(texts), self.chunk_size)]
+        results = []
+        for chunk_results in self._pool.map(_check_chunk, chunks):
+            results.extend(chunk_results)
+        return results
+
+    def _refresh_section(self, section, records):
+        '''
+        Re-checks the stale fields of a section and returns its entries
+        in record order
+        '''
+        with self._lock:
+            entries = self._entries(section, records)
+            stale = self._stale_fields(section, entries)
+            checked = self._check_texts([text for _, _, text in stale])
+            for (entry, field, text), corrections in zip(stale, checked):
+                entry[field] = (text, corrections)
+        return [entry for entry, _ in entries]
+
+    def _iter_section(self, section, entries):
+        '''
+        Yields the cached corrections of a section in record order
+        '''
+        for entry in entries:
+            for field in self.fields[section]:
+                yield from entry[field][1]
+
+    def check_section(self, section, records):
+        '''
+        Returns the corrections for every record of a section
+        '''
+        return list(self._iter_section(section, self._refresh_section(section, records)))
+
+    def _data_versions(self, data):
+        '''
+        Returns the store versions of every section, which also catch
+        writes made by other worker processes
+        '''
+        return tuple(getattr(data[section], 'version', None) for section in self.fields)
+
+    def corrections(self, data):
+        '''
+        Returns the corrections for every section, reusing the previous
+        response when nothing changed since it was built
+        '''
+        versions = self._data_versions(data)
+        if self._response is None or versions != self._versions:
+            corrections = []
+            for section in self.fields:
+                corrections.extend(self.check_section(section, data[section]))
+            self._response = corrections
+            self._versions = versions
+        return self._response
+
+    def iter_corrections(self, data):
+        '''
+        Yields the corrections section by section as each one is checked,
+        without building the whole response in memory
+        '''
+        if self._response is not None and self._data_versions(data) == self._versions:
+            yield from self._response
+            return
+        for section in self.fields:
+            yield from self._iter_section(section, self._refresh_section(section, data[section]))
+
+    def clear(self):
+        '''
+        Drops every cached result
+        '''
+        with self._lock:
+            self._results = {section: {} for section in self.fields}
+            self._response = None
+
+    def shutdown(self):
+        '''
+        Stops the process pool, if one was started
+        '''
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
@@ -0,0 +1,653 @@
+'''
+Storage backends for the Resume API.
+
+Every backend maps a section name ("experience", "education", "skill") to a
+collection of model instances addressed by stable integer IDs. IDs are
+assigned in increasing order and never reused, so deleting a record does
+not change the ID of any other record. Collections iterate in ID order and
+expose version, a counter that changes on every write.
+'''
+import gc
+import os
+import sqlite3
+import threading
+from bisect import bisect_right
+from collections.abc import Mapping
+from contextlib import ExitStack
+from dataclasses import astuple, fields
+from itertools import islice
+
+from models import Education, Experience, Skill
+from wal import RecordCodec, WriteAheadLog, read_log, read_snapshot, write_snapshot
+
+SECTION_MODELS = {
+    "experience": Experience,
+    "education": Education,
+    "skill": Skill
+}
+
+
+class MemoryCollection:  # pylint: disable=too-many-instance-attributes
+    '''
+    In-memory collection. Records live in a dict keyed by ID, so lookups,
+    updates and deletes are O(1). A sorted list of IDs serves as the
+    ordered index for cursor pages; deleted IDs stay in it until they
+    outnumber the live ones and the list is compacted.
+
+    Writers hold a per-collection lock, so writes to different sections
+    never contend. Readers do not take it: lookups read the live dict, and
+    iteration goes over an immutable snapshot of the records that is
+    built on the first read after a write and shared until the next one.
+
+    When a journal is set, every write is handed to it as resolved
+    (op, ID, record) operations before it is applied.
+    '''
+
+    def __init__(self, section=None, journal=None):
+        self.section = section
+        self.journal = journal
+        self.version = 0
+        self.lock = threading.Lock()
+        self._records = {}
+        self._order = []
+        self._next_id = 0
+        self._snapshot = ()
+
+    def __len__(self):
+        return len(self._records)
+
+    def __iter__(self):
+        return (record for _, record in self.snapshot())
+
+    def __contains__(self, record_id):
+        return record_id in self._records
+
+    def __getitem__(self, record_id):
+        return self._records[record_id]
+
+    def snapshot(self):
+        '''
+        Returns a tuple of the (ID, record) pairs in order, as of the
+        last write
+        '''
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self.lock:
+                snapshot = self.state()[2]
+        return snapshot
+
+    def state(self):
+        '''
+        Returns (next ID, version, (ID, record) pairs). The lock must be
+        held by the caller.
+        '''
+        if self._snapshot is None:
+            self._snapshot = tuple(self._records.items())
+        return self._next_id, self.version, self._snapshot
+
+    def get(self, record_id, default=None):
+        '''
+        Returns the record with an ID, or default if there is none
+        '''
+        return self._records.get(record_id, default)
+
+    def keys(self):
+        '''
+        Returns the IDs of the records, in order
+        '''
+        return [record_id for record_id, _ in self.snapshot()]
+
+    def items(self):
+        '''
+        Returns (ID, record) pairs, in order
+        '''
+        return self.snapshot()
+
+    def _perform(self, operations):
+        '''
+        Applies resolved (op, ID, record) operations and bumps the version,
+        with the lock held
+        '''
+        for op, record_id, record in operations:
+            if op == "delete":
+                self._records.pop(record_id, None)
+            else:
+                if op == "create":
+                    self._order.append(record_id)
+                    self._next_id = max(self._next_id, record_id + 1)
+                self._records[record_id] = record
+        if len(self._order) > 2 * len(self._records) + 16:
+            # A new list is swapped in, so pages being read keep the old one
+            self._order = list(self._records)
+        self._snapshot = None
+        self.version += 1
+
+    def _write(self, operations):
+        '''
+        Journals and applies resolved operations, with the lock held
+        '''
+        if self.journal is not None:
+            self.journal.log_write(self.section, operations)
+        self._perform(operations)
+
+    def _written(self):
+        '''
+        Tells the journal a write finished, once the lock is released
+        '''
+        if self.journal is not None:
+            self.journal.after_write()
+
+    def add(self, record):
+        '''
+        Stores a new record and returns its ID
+        '''
+        with self.lock:
+            record_id = self._next_id
+            self._write([("create", record_id, record)])
+        self._written()
+        return record_id
+
+    def replace(self, record_id, record):
+        '''
+        Replaces the record with an ID, returning False if there is none
+        '''
+        with self.lock:
+            if record_id not in self._records:
+                return False
+            self._write([("update", record_id, record)])
+        self._written()
+        return True
+
+    def remove(self, record_id):
+        '''
+        Removes and returns the record with an ID, or None if there is none
+        '''
+        with self.lock:
+            record = self._records.get(record_id)
+            if record is None:
+                return None
+            self._write([("delete", record_id, None)])
+        self._written()
+        return record
+
+    def apply(self, operations):
+        '''
+        Applies (op, ID, record) operations all or nothing and returns the
+        ID of each one. Raises KeyError before changing anything when an
+        update or delete targets a missing record.
+        '''
+        with self.lock:
+            removed = set()
+            resolved = []
+            next_id = self._next_id
+            for op, record_id, record in operations:
+                if op == "create":
+                    record_id = next_id
+                    next_id += 1
+                elif record_id not in self._records or record_id in removed:
+                    raise KeyError(record_id)
+                elif op == "delete":
+                    removed.add(record_id)
+                resolved.append((op, record_id, record))
+            if resolved:
+                self._write(resolved)
+        if resolved:
+            self._written()
+        return [record_id for _, record_id, _ in resolved]
+
+    def replay(self, operations):
+        '''
+        Applies resolved operations read back from a journal
+        '''
+        with self.lock:
+            self._perform(operations)
+
+    def restore(self, next_id, version, items):
+        '''
+        Replaces the content of the collection by a saved state
+        '''
+        with self.lock:
+            self._records = dict(items)
+            self._order = list(self._records)
+            self._next_id = next_id
+            self.version = version
+            self._snapshot = None
+
+    def page(self, after, limit):
+        '''
+        Returns up to limit (ID, record) pairs with IDs greater than after,
+        or from the first record when after is None
+        '''
+        order = self._order
+        start = 0 if after is None else bisect_right(order, after)
+        page = []
+        for record_id in islice(order, start, None):
+            if len(page) >= limit:
+                break
+            record = self._records.get(record_id)
+            if record is not None:
+                page.append((record_id, record))
+        return page
+
+
+class MemoryStore(dict):
+    '''
+    Keeps every section in process memory. State is lost on restart and
+    is not shared between worker processes.
+    '''
+
+    def __init__(self, models=None):
+        super().__init__({section: MemoryCollection(section)
+                          for section in models or SECTION_MODELS})
+
+    def seed(self, initial):
+        '''
+        Fills the store with the initial records if it is empty
+        '''
+        if not any(len(collection) for collection in self.values()):
+            for section, records in initial.items():
+                for record in records:
+                    self[section].add(record)
+
+
+class DurableMemoryStore(MemoryStore):  # pylint: disable=too-many-instance-attributes
+    '''
+    Memory store made durable by a write-ahead log. Every write is logged
+    before it is applied; once snapshot_every writes were logged, a
+    background thread saves a snapshot and starts a new log generation.
+
+    On startup the latest snapshot is loaded and the logs written after
+    it are replayed, so records survive restarts without being re-seeded.
+    Files are named <path>.snapshot and <path>.wal.<generation>.
+    '''
+
+    def __init__(self, path, models=None, fsync="batch", snapshot_every=10000,  # pylint: disable=R0913,R0917
+                 fsync_interval=0.05):
+        super().__init__(models)
+        self.path = path
+        self.codec = RecordCodec(models or SECTION_MODELS)
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.snapshot_every = snapshot_every
+        self._compacting = threading.Lock()
+        # Recovery allocates every record at once, which would otherwise
+        # trigger many useless garbage collections
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            self.generation = self._recover()
+        finally:
+            if gc_enabled:
+                gc.enable()
+        self.log = WriteAheadLog(self.log_path(self.generation), fsync, fsync_interval)
+        for collection in self.values():
+            collection.journal = self
+
+    def log_path(self, generation):
+        '''
+        Returns the path of the log of a generation
+        '''
+        return f"{self.path}.wal.{generation}"
+
+    def log_generations(self):
+        '''
+        Returns the generations of the log files on disk, in order
+        '''
+        directory = os.path.dirname(os.path.abspath(self.path))
+        prefix = os.path.basename(self.path) + ".wal."
+        return sorted(int(name[len(prefix):]) for name in os.listdir(directory)
+                      if name.startswith(prefix) and name[len(prefix):].isdigit())
+
+    def _recover(self):
+        '''
+        Loads the latest snapshot, replays the logs written after it and
+        returns the generation to keep appending to
+        '''
+        generation = 0
+        saved = read_snapshot(f"{self.path}.snapshot", self.codec)
+        if saved is not None:
+            generation, state = saved
+            for section, (next_id, version, items) in state.items():
+                self[section].restore(next_id, version, items)
+
+        for log_generation in self.log_generations():
+            if log_generation < generation:
+                continue
+            path = self.log_path(log_generation)
+            writes, valid_length = read_log(path, self.codec)
+            for section, operations in writes:
+                self[section].replay(operations)
+            if valid_length < os.path.getsize(path):
+                # Drop a frame torn by a crash so new frames follow valid ones
+                os.truncate(path, valid_length)
+            generation = log_generation
+        return generation
+
+    def log_write(self, section, operations):
+        '''
+        Appends a write to the log, called with the section lock held
+        '''
+        self.log.append(self.codec.encode_frame(section, operations))
+
+    def after_write(self):
+        '''
+        Starts a snapshot in the background once enough writes were logged
+        '''
+        if self.log.frames < self.snapshot_every:
+            return
+        # The lock is released by the snapshot thread once it is done
+        if self._compacting.acquire(blocking=False):  # pylint: disable=consider-using-with
+            threading.Thread(target=self._compact_and_release, name="snapshot",
+                             daemon=True).start()
+
+    def _compact_and_release(self):
+        '''
+        Saves a snapshot, then lets the next one be started
+        '''
+        try:
+            self._compact()
+        finally:
+            self._compacting.release()
+
+    def compact(self):
+        '''
+        Saves a snapshot of the store and drops the logs it covers
+        '''
+        with self._compacting:
+            self._compact()
+
+    def _compact(self):
+        '''
+        Captures every section and switches to a new log generation while
+        all section locks are held, then writes the snapshot
+        '''
+        with ExitStack() as locks:
+            for section in self.codec.sections:
+                locks.enter_context(self[section].lock)
+            state = {section: self[section].state() for section in self.codec.sections}
+            previous = self.log
+            self.generation += 1
+            self.log = WriteAheadLog(self.log_path(self.generation), self.fsync,
+                                     self.fsync_interval)
+        previous.close()
+        write_snapshot(f"{self.path}.snapshot", self.codec, self.generation, state)
+        for generation in self.log_generations():
+            if generation < self.generation:
+                os.remove(self.log_path(generation))
+
+    def close(self):
+        '''
+        Flushes and closes the log
+        '''
+        with self._compacting:
+            self.log.close()
+
+
+class SQLiteCollection:  # pylint: disable=too-many-instance-attributes
+    '''
+    Collection backed by one SQLite table whose primary key is the record ID
+    '''
+
+    def __init__(self, store, section, model):
+        self.store = store
+        self.section = section
+        self.model = model
+        columns = [field.name for field in fields(model)]
+        names = ", ".join(columns)
+        self._select = f"SELECT id, {names} FROM {section} ORDER BY id"
+        self._select_id = f"SELECT {names} FROM {section} WHERE id = ?"
+        self._select_page = f"SELECT id, {names} FROM {section} WHERE id > ? ORDER BY id LIMIT ?"
+        self._insert = (f"INSERT INTO {section} (id, {names}) "
+                        f"VALUES (?, {', '.join('?' for _ in columns)})")
+        self._update = (f"UPDATE {section} SET {', '.join(f'{c} = ?' for c in columns)} "
+                        "WHERE id = ?")
+        self._delete = f"DELETE FROM {section} WHERE id = ?"
+        self._count = f"SELECT COUNT(*) FROM {section}"
+
+    @property
+    def version(self):
+        '''
+        Returns the number of writes made to the section
+        '''
+        return self.store.version(self.section)
+
+    def __len__(self):
+        return self.store.connection.execute(self._count).fetchone()[0]
+
+    def __iter__(self):
+        for row in self.store.connection.execute(self._select):
+            yield self.model(*row[1:])
+
+    def __contains__(self, record_id):
+        return self.get(record_id) is not None
+
+    def __getitem__(self, record_id):
+        record = self.get(record_id)
+        if record is None:
+            raise KeyError(record_id)
+        return record
+
+    def get(self, record_id, default=None):
+        '''
+        Returns the record with an ID, or default if there is none
+        '''
+        row = self.store.connection.execute(self._select_id, (record_id,)).fetchone()
+        return self.model(*row) if row else default
+
+    def keys(self):
+        '''
+        Returns the IDs of the records, in order
+        '''
+        return [record_id for record_id, _ in self.items()]
+
+    def items(self):
+        '''
+        Returns (ID, record) pairs, in order
+        '''
+        return [(row[0], self.model(*row[1:]))
+                for row in self.store.connection.execute(self._select)]
+
+    def insert(self, connection, record):
+        '''
+        Inserts a record inside an open transaction and returns its ID
+        '''
+        record_id = connection.execute(
+            "UPDATE sections SET next_id = next_id + 1 WHERE section = ? RETURNING next_id - 1",
+            (self.section,)).fetchone()[0]
+        connection.execute(self._insert, (record_id,) + astuple(record))
+        return record_id
+
+    def add(self, record):
+        '''
+        Stores a new record and returns its ID
+        '''
+        with self.store.write(self.section) as connection:
+            return self.insert(connection, record)
+
+    def replace(self, record_id, record):
+        '''
+        Replaces the record with an ID, returning False if there is none
+        '''
+        write = self.store.write(self.section)
+        with write as connection:
+            write.changed = connection.execute(
+                self._update, astuple(record) + (record_id,)).rowcount > 0
+        return write.changed
+
+    def remove(self, record_id):
+        '''
+        Removes and returns the record with an ID, or None if there is none
+        '''
+        write = self.store.write(self.section)
+        with write as connection:
+            row = connection.execute(self._select_id, (record_id,)).fetchone()
+            write.changed = row is not None
+            if row is not None:
+                connection.execute(self._delete, (record_id,))
+        return self.model(*row) if row else None
+
+    def apply(self, operations):
+        '''
+        Applies (op, ID, record) operations in one transaction and returns
+        the ID of each one. Raises KeyError and rolls back when an update
+        or delete targets a missing record.
+        '''
+        ids = []
+        with self.store.write(self.section) as connection:
+            for op, record_id, record in operations:
+                if op == "create":
+                    record_id = self.insert(connection, record)
+                elif op == "update":
+                    if connection.execute(self._update,
+                                          astuple(record) + (record_id,)).rowcount == 0:
+                        raise KeyError(record_id)
+                elif connection.execute(self._delete, (record_id,)).rowcount == 0:
+                    raise KeyError(record_id)
+                ids.append(record_id)
+        return ids
+
+    def page(self, after, limit):
+        '''
+        Returns up to limit (ID, record) pairs with IDs greater than after,
+        or from the first record when after is None
+        '''
+        rows = self.store.connection.execute(
+            self._select_page, (-1 if after is None else after, limit))
+        return [(row[0], self.model(*row[1:])) for row in rows]
+
+
+class SQLiteWrite:
+    '''
+    Context manager for one write transaction that bumps a section version.
+    Writes that found nothing to change set changed to False, so the
+    version is left alone, as in the in-memory store.
+    '''
+
+    def __init__(self, connection, section):
+        self.connection = connection
+        self.section = section
+        self.changed = True
+
+    def __enter__(self):
+        self.connection.execute("BEGIN IMMEDIATE")
+        return self.connection
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            if self.changed:
+                self.connection.execute(
+                    "UPDATE sections SET version = version + 1 WHERE section = ?",
+                    (self.section,))
+            self.connection.execute("COMMIT")
+        else:
+            self.connection.execute("ROLLBACK")
+        return False
+
+
+class SQLiteStore(Mapping):
+    '''
+    Keeps every section in an embedded SQLite database in WAL mode, so
+    state survives restarts and is shared by every worker process.
+    '''
+
+    def __init__(self, path, models=None):
+        self.path = path
+        self.models = models or SECTION_MODELS
+        self._local = threading.local()
+        self._collections = {section: SQLiteCollection(self, section, model)
+                             for section, model in self.models.items()}
+        self._create_tables()
+
+    @property
+    def connection(self):
+        '''
+        Returns the connection of the calling thread
+        '''
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            # Transactions are managed explicitly by SQLiteWrite
+            connection = sqlite3.connect(self.path, isolation_level=None,
+                                         cached_statements=256)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA busy_timeout=5000")
+            self._local.connection = connection
+        return connection
+
+    def _create_tables(self):
+        '''
+        Creates the section tables and the section metadata table if needed
+        '''
+        connection = self.connection
+        connection.execute("CREATE TABLE IF NOT EXISTS sections (section TEXT PRIMARY KEY, "
+                           "version INTEGER NOT NULL, next_id INTEGER NOT NULL)")
+        for section, model in self.models.items():
+            columns = ", ".join(f"{field.name} TEXT NOT NULL" for field in fields(model))
+            connection.execute(f"CREATE TABLE IF NOT EXISTS {section} "
+                               f"(id INTEGER PRIMARY KEY, {columns})")
+            connection.execute("INSERT OR IGNORE INTO sections VALUES (?, 0, 0)", (section,))
+
+    def write(self, section):
+        '''
+        Returns a transaction context that bumps the section version
+        '''
+        return SQLiteWrite(self.connection, section)
+
+    def version(self, section):
+        '''
+        Returns the number of writes made to a section
+        '''
+        return self.connection.execute(
+            "SELECT version FROM sections WHERE section = ?", (section,)).fetchone()[0]
+
+    def seed(self, initial):
+        '''
+        Fills the store with the initial records if it is empty. The check
+        and the inserts share one transaction, so concurrent workers
+        starting at once seed the store only once.
+        '''
+        connection = self.connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            empty = all(connection.execute(f"SELECT 1 FROM {section} LIMIT 1").fetchone() is None
+                        for section in self.models)
+            if empty:
+                for section, records in initial.items():
+                    for record in records:
+                        self._collections[section].insert(connection, record)
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    def close(self):
+        '''
+        Closes the connection of the calling thread
+        '''
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def __getitem__(self, section):
+        return self._collections[section]
+
+    def __iter__(self):
+        return iter(self._collections)
+
+    def __len__(self):
+        return len(self._collections)
+
+
+def open_store(backend="sqlite", path="resume.db", fsync="batch", snapshot_every=10000):
+    '''
+    Returns the store for a backend name, "sqlite", "memory" or "wal".
+    The fsync policy and snapshot interval only apply to "wal".
+    '''
+    if backend == "memory":
+        return MemoryStore()
+    if backend == "wal":
+        return DurableMemoryStore(path, fsync=fsync, snapshot_every=snapshot_every)
+    if backend == "sqlite":
+        return SQLiteStore(path)
+    raise ValueError(f"Unknown storage backend: {backend}")
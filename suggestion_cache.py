@@ -0,0 +1,146 @@
+'''
+Content-addressed cache for LLM suggestions
+'''
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+from hashlib import sha256
+from threading import Lock
+
+
+def suggestion_key(prompt, model_name, generation_config):
+    '''
+    Returns the cache key of a prompt sent with a model and generation config
+    '''
+    material = json.dumps([prompt, model_name, generation_config], sort_keys=True)
+    return sha256(material.encode('utf-8')).hexdigest()
+
+
+class SuggestionCache:  # pylint: disable=too-many-instance-attributes
+    '''
+    Two-tier suggestion cache with TTL-based expiry.
+
+    The memory tier is a bounded LRU. The optional disk tier is a SQLite
+    file, so cached suggestions survive restarts and are shared by
+    workers. Empty suggestion lists are never stored, since they mean the
+    upstream call failed.
+
+    Expired entries are deleted from both tiers when the cache is opened
+    and every evict_every stores, so the disk tier does not keep growing.
+    '''
+
+    def __init__(self, maxsize=1024, ttl=86400.0, path=None, evict_every=256):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.path = path
+        self.evict_every = evict_every
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        self._memory = OrderedDict()
+        self._lock = Lock()
+        self._disk = None
+        if path:
+            self._disk = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._disk.execute("PRAGMA journal_mode=WAL")
+            self._disk.execute("CREATE TABLE IF NOT EXISTS suggestions "
+                               "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)")
+            self._disk.execute("CREATE INDEX IF NOT EXISTS suggestions_expires "
+                               "ON suggestions (expires)")
+            self.evict_expired()
+
+    def _remember(self, key, value, expires):
+        '''
+        Stores an entry in the memory tier, evicting the least recently used
+        '''
+        self._memory[key] = (value, expires)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        '''
+        Returns the cached suggestions for a key, or None
+        '''
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[1] <= now:
+                del self._memory[key]
+                entry = None
+            if entry is None and self._disk is not None:
+                row = self._disk.execute("SELECT value, expires FROM suggestions "
+                                         "WHERE key = ? AND expires > ?", (key, now)).fetchone()
+                if row is not None:
+                    entry = (json.loads(row[0]), row[1])
+                    self._remember(key, *entry)
+            elif entry is not None:
+                self._memory.move_to_end(key)
+
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, suggestions):
+        '''
+        Stores suggestions for a key, ignoring empty results
+        '''
+        if not suggestions:
+            return
+        expires = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, suggestions, expires)
+            if self._disk is not None:
+                self._disk.execute("INSERT OR REPLACE INTO suggestions VALUES (?, ?, ?)",
+                                   (key, json.dumps(suggestions), expires))
+            self._puts += 1
+            if self._puts >= self.evict_every:
+                self._evict_expired()
+
+    def _evict_expired(self):
+        '''
+        Drops every expired entry from both tiers. The lock must be held.
+        '''
+        now = time.time()
+        for key in [key for key, (_, expires) in self._memory.items() if expires <= now]:
+            del self._memory[key]
+        if self._disk is not None:
+            self._disk.execute("DELETE FROM suggestions WHERE expires <= ?", (now,))
+        self._puts = 0
+
+    def evict_expired(self):
+        '''
+        Drops every expired entry from both tiers
+        '''
+        with self._lock:
+            self._evict_expired()
+
+    def stats(self):
+        '''
+        Returns the hit ratio and the number and size of stored entries
+        '''
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": sum(len(json.dumps(value)) for value, _ in self._memory.values())
+            }
+            if self._disk is not None:
+                entries, size = self._disk.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM suggestions").fetchone()
+                stats.update(disk_entries=entries, disk_bytes=size)
+            return stats
+
+    def close(self):
+        '''
+        Closes the disk tier
+        '''
+        if self._disk is not None:
+            self._disk.close()
+            self._disk = None
@@ -0,0 +1,267 @@
+'''
+Suggestion pipeline for the Resume API.
+
+Prompts are sent to the LLM client from a bounded thread pool. Concurrent
+requests for the same prompt share one upstream call, and a request waits
+at most a configured timeout for its result.
+'''
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from threading import Lock
+
+from suggestion_cache import suggestion_key
+
+GENERATION_CONFIG = {
+    "temperature": 0.7,
+    "top_p": 0.9,
+    "top_k": 50,
+    "max_output_tokens": 150,
+    "response_mime_type": "text/plain"
+}
+
+logger = logging.getLogger(__name__)
+
+BATCH_HEADER = re.compile(r'^[ \t#*]*Experience\s+(\d+)[ \t:*]*$', re.MULTILINE | re.IGNORECASE)
+
+
+class SuggestionError(Exception):
+    '''
+    Raised when suggestions cannot be produced
+    '''
+
+
+class SuggestionQueueFull(SuggestionError):
+    '''
+    Raised when too many upstream calls are already in flight
+    '''
+
+
+class SuggestionTimeout(SuggestionError):
+    '''
+    Raised when the upstream call does not finish in time
+    '''
+
+
+class GeminiClient:  # pylint: disable=too-few-public-methods
+    '''
+    Reusable Gemini client. The model is built once and shared by every
+    request instead of being rebuilt per call.
+    '''
+
+    def __init__(self, genai, model_name="gemini-1.5-flash", generation_config=None):
+        self.model_name = model_name
+        self.generation_config = generation_config or GENERATION_CONFIG
+        self.model = genai.GenerativeModel(
+            model_name=model_name,
+            generation_config=self.generation_config
+        )
+
+    def generate(self, prompt, max_output_tokens=None):
+        '''
+        Returns the text generated for a prompt, optionally allowing a
+        longer answer than the default generation config
+        '''
+        if max_output_tokens is None:
+            return self.model.generate_content(prompt).text
+        generation_config = dict(self.generation_config, max_output_tokens=max_output_tokens)
+        return self.model.generate_content(prompt, generation_config=generation_config).text
+
+
+def build_prompt(description):
+    '''
+    Returns the prompt asking for suggestions on one job description
+    '''
+    return (
+        f"The following is a job description:\n\"{description}\"\n\n"
+        "Provide three suggestions to enhance this job description for better clarity and impact."
+    )
+
+
+def build_batch_prompt(descriptions):
+    '''
+    Returns one prompt asking for suggestions on several job descriptions,
+    given as a dict of experience ID to description
+    '''
+    parts = [
+        "The following are job descriptions, each under a heading \"### Experience <id>\".\n"
+        "For each one, provide three suggestions to enhance it for better clarity and impact. "
+        "Answer with the same headings, each followed by its suggestions, one per line."
+    ]
+    for experience_id, description in descriptions.items():
+        parts.append(f"### Experience {experience_id}\n\"{description}\"")
+    return "\n\n".join(parts)
+
+
+def parse_suggestions(text):
+    '''
+    Returns the non-empty lines of a response without list markers
+    '''
+    return [s.strip("- ").strip() for s in text.split('\n') if s.strip()]
+
+
+def parse_batch_suggestions(text):
+    '''
+    Returns a dict of experience ID to suggestions from the answer to a
+    batch prompt
+    '''
+    parts = BATCH_HEADER.split(text)
+    return {int(experience_id): parse_suggestions(body)
+            for experience_id, body in zip(parts[1::2], parts[2::2])}
+
+
+def group_by_budget(descriptions, token_budget):
+    '''
+    Splits a dict of ID to description into dicts whose estimated prompt
+    size stays within token_budget, counting about four characters per
+    token
+    '''
+    groups = []
+    group = {}
+    used = 0
+    for experience_id, description in descriptions.items():
+        tokens = len(description) // 4 + 16
+        if group and used + tokens > token_budget:
+            groups.append(group)
+            group, used = {}, 0
+        group[experience_id] = description
+        used += tokens
+    if group:
+        groups.append(group)
+    return groups
+
+
+class SuggestionService:  # pylint: disable=too-many-instance-attributes
+    '''
+    Runs suggestion requests on a bounded thread pool with single-flight
+    coalescing: while a prompt is in flight, other requests for the same
+    prompt wait on the same future.
+
+    When a cache is given, suggestions are looked up by a hash of the
+    prompt and the client's model and generation config before any
+    upstream call is made.
+    '''
+
+    def __init__(self, client_factory, workers=4, max_queue=32, timeout=30.0,  # pylint: disable=R0913,R0917
+                 cache=None):
+        self.client_factory = client_factory
+        self.cache = cache
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._client = None
+        self._executor = ThreadPoolExecutor(max_workers=workers,
+                                            thread_name_prefix="suggestions")
+        self._inflight = {}
+        self._lock = Lock()
+
+    @property
+    def client(self):
+        '''
+        Returns the LLM client, creating it on first use
+        '''
+        with self._lock:
+            if self._client is None:
+                self._client = self.client_factory()
+            return self._client
+
+    @client.setter
+    def client(self, client):
+        with self._lock:
+            self._client = client
+
+    def cache_key(self, prompt):
+        '''
+        Returns the cache key of a prompt for the current client
+        '''
+        client = self.client
+        return suggestion_key(prompt, getattr(client, "model_name", None),
+                              getattr(client, "generation_config", None))
+
+    def _call(self, prompt, parse, max_output_tokens):
+        '''
+        Sends one prompt upstream and parses the answer
+        '''
+        if max_output_tokens is None:
+            return parse(self.client.generate(prompt))
+        return parse(self.client.generate(prompt, max_output_tokens=max_output_tokens))
+
+    def _done(self, key):
+        '''
+        Returns a callback that forgets a call once it finished
+        '''
+        def forget(_future):
+            with self._lock:
+                self._inflight.pop(key, None)
+        return forget
+
+    def submit(self, prompt, parse=parse_suggestions, max_output_tokens=None):
+        '''
+        Returns a future for the parsed answer to a prompt, joining the
+        call already in flight for the same prompt if there is one
+        '''
+        key = (prompt, parse, max_output_tokens)
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future
+            if len(self._inflight) >= self.max_queue:
+                raise SuggestionQueueFull("Too many suggestion requests in flight")
+            future = self._executor.submit(self._call, prompt, parse, max_output_tokens)
+            self._inflight[key] = future
+        future.add_done_callback(self._done(key))
+        return future
+
+    def suggest(self, prompt, timeout=None):
+        '''
+        Returns the suggestions for a prompt, waiting at most timeout seconds
+        '''
+        if self.cache is not None:
+            cached = self.cache.get(self.cache_key(prompt))
+            if cached is not None:
+                return cached
+        future = self.submit(prompt)
+        try:
+            suggestions = future.result(timeout=self.timeout if timeout is None else timeout)
+        except FutureTimeout as error:
+            raise SuggestionTimeout("Timed out waiting for suggestions") from error
+        if self.cache is not None:
+            self.cache.put(self.cache_key(prompt), suggestions)
+        return suggestions
+
+    def suggest_batch(self, descriptions, token_budget=2000, tokens_per_answer=150):
+        '''
+        Returns suggestions for a dict of experience ID to description,
+        sending one combined prompt per group of descriptions that fits in
+        token_budget. Each ID maps to {"suggestions": [...]} or, when its
+        group failed or its answer is missing, to {"error": ...}.
+        '''
+        calls = []
+        for group in group_by_budget(descriptions, token_budget):
+            future = self.submit(build_batch_prompt(group), parse=parse_batch_suggestions,
+                                 max_output_tokens=tokens_per_answer * len(group))
+            calls.append((group, future))
+
+        results = {}
+        for group, future in calls:
+            try:
+                answers = future.result(timeout=self.timeout)
+                error = "No suggestions returned"
+            except FutureTimeout:
+                answers, error = {}, "Timed out waiting for suggestions"
+            except Exception:  # pylint: disable=broad-exception-caught
+                # The upstream error may carry configuration details, so it
+                # is logged rather than sent to the client
+                logger.exception("Batch suggestion call failed")
+                answers, error = {}, "Failed to generate suggestions"
+            for experience_id in group:
+                if answers.get(experience_id):
+                    results[experience_id] = {"suggestions": answers[experience_id]}
+                else:
+                    results[experience_id] = {"error": error}
+        return results
+
+    def shutdown(self):
+        '''
+        Stops the thread pool
+        '''
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,302 @@
+'''
+Symmetric-delete spelling correction over a memory-mapped index.
+
+Instead of generating every edit of a misspelled word at query time, the
+index maps every string obtained by deleting up to max_distance
+characters from a dictionary word to that word. A word within
+max_distance edits of a dictionary word shares at least one of these
+deletes with it, so the candidates of a lookup are the words indexed
+under the deletes of the query, verified with the Damerau-Levenshtein
+distance.
+
+Deletes are indexed by their CRC32, in a sorted array searched with
+bisect. Hash collisions only add candidates that fail verification. The
+index file is read through mmap, so every worker process opening it
+shares the same pages.
+'''
+import mmap
+import os
+import string
+import struct
+import zlib
+from array import array
+from bisect import bisect_left
+from itertools import accumulate
+from unicodedata import combining, normalize
+
+INDEX_MAGIC = b"SYMSPEL1"
+INDEX_HEADER = struct.Struct("=8sIIIIQQ")
+BYTE_ORDER_MARK = 0x01020304
+
+
+class StaleIndex(ValueError):
+    '''
+    Raised when an index file is truncated or was written by another
+    version or on a machine with another byte order
+    '''
+
+
+def should_check(word, longest_word_length):
+    '''
+    Returns whether a word is checked at all, using the same rules as
+    pyspellchecker: punctuation, numbers and words much longer than any
+    dictionary word are left alone
+    '''
+    if len(word) == 1 and word in string.punctuation:
+        return False
+    if len(word) > longest_word_length + 3:
+        return False
+    if word.lower() in ("nan", "inf", "infinity"):
+        return True
+    try:
+        float(word)
+        return False
+    except ValueError:
+        return True
+
+
+def deletes(word, max_distance):
+    '''
+    Returns the word and every string obtained by deleting up to
+    max_distance of its characters
+    '''
+    found = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        frontier = {text[:i] + text[i + 1:] for text in frontier for i in range(len(text))}
+        found |= frontier
+    return found
+
+
+def delete_hash(text):
+    '''
+    Returns the key of a delete in the index
+    '''
+    return zlib.crc32(text.encode('utf-8'))
+
+
+def remove_diacritics(word):
+    '''
+    Returns the word without its accents
+    '''
+    return "".join(char for char in normalize("NFKD", word) if not combining(char))
+
+
+def edit_distance(source, target):
+    '''
+    Returns the Damerau-Levenshtein distance between two strings, the
+    fewest deletions, insertions, substitutions and transpositions of
+    adjacent characters turning one into the other
+    '''
+    start = 0
+    while start < len(source) and start < len(target) and source[start] == target[start]:
+        start += 1
+    end = 0
+    while (end < len(source) - start and end < len(target) - start
+           and source[-1 - end] == target[-1 - end]):
+        end += 1
+    source = source[start:len(source) - end]
+    target = target[start:len(target) - end]
+    if not source or not target:
+        return len(source) + len(target)
+
+    infinity = len(source) + len(target)
+    rows = [[infinity] * (len(target) + 2)]
+    rows += [[infinity, *range(len(target) + 1)]]
+    rows += [[infinity, i] + [0] * len(target) for i in range(1, len(source) + 1)]
+    last_row = {}
+    for i in range(1, len(source) + 1):
+        last_column = 0
+        for j in range(1, len(target) + 1):
+            swap_row = last_row.get(target[j - 1], 0)
+            swap_column = last_column
+            cost = 1
+            if source[i - 1] == target[j - 1]:
+                cost = 0
+                last_column = j
+            rows[i + 1][j + 1] = min(rows[i][j] + cost, rows[i + 1][j] + 1, rows[i][j + 1] + 1,
+                                     rows[swap_row][swap_column]
+                                     + (i - swap_row - 1) + 1 + (j - swap_column - 1))
+        last_row[source[i - 1]] = i
+    return rows[-1][-1]
+
+
+def build_index(path, frequencies, max_distance=2):  # pylint: disable=too-many-locals
+    '''
+    Writes the index of a word to frequency mapping to path, atomically
+    replacing any previous index
+    '''
+    longest = max(map(len, frequencies), default=0)
+    words = sorted(word for word in frequencies if should_check(word, longest))
+    counts = array('Q', (frequencies[word] for word in words))
+
+    # Pairs of (hash << 32 | word ID) are spread over buckets by the top
+    # byte of their hash, so each bucket can be sorted on its own
+    buckets = [array('Q') for _ in range(256)]
+    for word_id, word in enumerate(words):
+        for text in deletes(word, max_distance):
+            key = delete_hash(text)
+            buckets[key >> 24].append(key << 32 | word_id)
+    hashes = array('I')
+    ids = array('I')
+    for bucket in buckets:
+        for pair in sorted(bucket):
+            hashes.append(pair >> 32)
+            ids.append(pair & 0xFFFFFFFF)
+        del bucket[:]
+
+    encoded = [word.encode('utf-8') for word in words]
+    text = b"".join(encoded)
+    offsets = array('I', accumulate(map(len, encoded), initial=0))
+
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, 'wb') as index:
+        index.write(INDEX_HEADER.pack(INDEX_MAGIC, BYTE_ORDER_MARK, max_distance, longest,
+                                      len(words), len(hashes), len(text)))
+        for part in (counts, hashes, ids, offsets):
+            index.write(part.tobytes())
+        index.write(text)
+        index.flush()
+        os.fsync(index.fileno())
+    os.replace(temporary, path)
+
+
+class SymSpellChecker:  # pylint: disable=too-many-instance-attributes
+    '''
+    Spell checker answering unknown() and correction() like
+    pyspellchecker's SpellChecker, from an index built by build_index.
+
+    Corrections are the dictionary words at the smallest edit distance,
+    preferring words that only differ by their accents and then the most
+    frequent word, so they match pyspellchecker's except between words
+    of equal frequency, which pyspellchecker orders arbitrarily.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as index:
+            size = os.fstat(index.fileno()).st_size
+            if size < INDEX_HEADER.size:
+                raise StaleIndex(f"{path} is truncated")
+            self._mapped = mmap.mmap(index.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mapped)
+        try:
+            self._parse(size)
+        except StaleIndex:
+            self.close()
+            raise
+
+    def _parse(self, size):
+        '''
+        Maps the arrays of the index
+        '''
+        (magic, mark, self.max_distance, self.longest_word_length,
+         words, pairs, text_size) = INDEX_HEADER.unpack_from(self._view, 0)
+        if magic != INDEX_MAGIC or mark != BYTE_ORDER_MARK:
+            raise StaleIndex(f"{self.path} is not an index of this version or byte order")
+        layout = (('Q', words), ('I', pairs), ('I', pairs), ('I', words + 1), ('B', text_size))
+        if INDEX_HEADER.size + sum(array(code).itemsize * count
+                                   for code, count in layout) != size:
+            raise StaleIndex(f"{self.path} is truncated")
+
+        offset = INDEX_HEADER.size
+        views = []
+        for code, count in layout:
+            end = offset + array(code).itemsize * count
+            views.append(self._view[offset:end].cast(code))
+            offset = end
+        self._counts, self._hashes, self._ids, self._offsets, self._text = views  # pylint: disable=unbalanced-tuple-unpacking
+
+    def __len__(self):
+        return len(self._counts)
+
+    def _word(self, word_id):
+        '''
+        Returns the dictionary word with an ID
+        '''
+        return str(self._text[self._offsets[word_id]:self._offsets[word_id + 1]], 'utf-8')
+
+    def _word_ids(self, text):
+        '''
+        Yields the IDs of the words indexed under a delete
+        '''
+        key = delete_hash(text)
+        position = bisect_left(self._hashes, key)
+        while position < len(self._hashes) and self._hashes[position] == key:
+            yield self._ids[position]
+            position += 1
+
+    def _find(self, word):
+        '''
+        Returns the ID of a dictionary word, or None
+        '''
+        for word_id in self._word_ids(word):
+            if self._word(word_id) == word:
+                return word_id
+        return None
+
+    def __contains__(self, word):
+        return self._find(word.lower()) is not None
+
+    def __getitem__(self, word):
+        word_id = self._find(word.lower())
+        return 0 if word_id is None else self._counts[word_id]
+
+    def known(self, words):
+        '''
+        Returns the subset of words found in the dictionary
+        '''
+        return {word.lower() for word in words
+                if word.lower() in self and should_check(word, self.longest_word_length)}
+
+    def unknown(self, words):
+        '''
+        Returns the subset of words missing from the dictionary
+        '''
+        return {word.lower() for word in words
+                if should_check(word, self.longest_word_length) and word.lower() not in self}
+
+    def candidates(self, word):
+        '''
+        Returns the dictionary words at the smallest edit distance of
+        word, up to max_distance, or None when there are none
+        '''
+        word = word.lower()
+        if word in self or not should_check(word, self.longest_word_length):
+            return {word}
+        tiers = [set() for _ in range(self.max_distance + 1)]
+        seen = set()
+        for text in deletes(word, self.max_distance):
+            for word_id in self._word_ids(text):
+                if word_id in seen:
+                    continue
+                seen.add(word_id)
+                candidate = self._word(word_id)
+                if abs(len(candidate) - len(word)) > self.max_distance:
+                    continue
+                distance = edit_distance(word, candidate)
+                if distance <= self.max_distance:
+                    tiers[distance].add(candidate)
+        return next((tier for tier in tiers[1:] if tier), None)
+
+    def correction(self, word):
+        '''
+        Returns the most probable correction for word, or None
+        '''
+        candidates = self.candidates(word)
+        if not candidates:
+            return None
+        plain = remove_diacritics(word.lower())
+        candidates = [candidate for candidate in candidates
+                      if remove_diacritics(candidate) == plain] or candidates
+        return min(candidates, key=lambda candidate: (-self[candidate], candidate))
+
+    def close(self):
+        '''
+        Releases the memory map of the index
+        '''
+        for name in ('_counts', '_hashes', '_ids', '_offsets', '_text', '_view'):
+            view = self.__dict__.pop(name, None)
+            if view is not None:
+                view.release()
+        self._mapped.close()
@@ -1,8 +1,44 @@
+# pylint: disable=too-many-lines
 '''
 Tests in Pytest
 '''
-from app import app, data
+import gzip
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import zlib
+
 import pytest
+from spellchecker import SpellChecker
+
+# The app reads its configuration at import
+os.environ['STORAGE_BACKEND'] = 'memory'
+os.environ['ASSET_DIRECTORY'] = tempfile.mkdtemp(prefix='resume-assets-')
+
+# pylint: disable=wrong-import-position
+import app as app_module
+from app import app, data
+from assets import AssetStore
+from json_provider import FastJSONProvider
+from lazy import Lazy, preload
+from models import Education, Experience, Skill
+from response_compression import compress_stream
+from schema import Schema, ValidationError
+from shards import HashRing, ShardUnavailable, start_shards
+from spellcheck import CachedSpellChecker, SpellcheckEngine, check_texts, spellchecker_loader
+from storage import DurableMemoryStore, MemoryStore, SQLiteStore
+from suggestion_cache import SuggestionCache
+from suggestions import SuggestionQueueFull, SuggestionService
+from symspell import SymSpellChecker, build_index
+# pylint: enable=wrong-import-position
+
+
+# Records naming the bundled logo point at its content-hashed asset URL
+EXAMPLE_LOGO_URL = app_module.DEFAULT_LOGO_URL
 
 
 def test_client():
@@ -35,7 +71,7 @@ def test_experience():
 
     get_response = app.test_client().get('/resume/experience')
     assert get_response.status_code == 200
-    assert get_response.json[item_id] == example_experience
+    assert get_response.json[item_id] == dict(example_experience, logo=EXAMPLE_LOGO_URL)
 
 
 def test_edit_experience():
@@ -60,7 +96,8 @@ def test_edit_experience():
     response_data = put_response.get_json()
     assert response_data == updated_experience, "Response data does not match the updated experience"
 
-    assert data['experience'][experience_id].__dict__ == updated_experience, "Data not updated correctly in the application"
+    assert data['experience'][experience_id].to_dict() == updated_experience, \
+        "Data not updated correctly in the application"
 
 
 def test_education():
@@ -83,7 +120,7 @@ def test_education():
 
     get_response = app.test_client().get('/resume/education')
     assert get_response.status_code == 200
-    assert get_response.json[item_id] == example_education
+    assert get_response.json[item_id] == dict(example_education, logo=EXAMPLE_LOGO_URL)
 
     # Clean up
     delete_response = app.test_client().delete(f'/resume/education/{item_id}')
@@ -108,7 +145,7 @@ def test_skill():
 
     get_response = app.test_client().get('/resume/skill')
     assert get_response.status_code == 200
-    assert get_response.json[item_id] == example_skill
+    assert get_response.json[item_id] == dict(example_skill, logo=EXAMPLE_LOGO_URL)
 
     # Clean up
     delete_response = app.test_client().delete(f'/resume/skill/{item_id}')
@@ -268,3 +305,964 @@ def test_spellcheck():
     # Clean up by deleting the faulty experience
     delete_response = app.test_client().delete(f'/resume/experience/{experience_id}')
     assert delete_response.status_code == 200
+
+
+def test_spellcheck_cache_invalidation():
+    '''
+    Checks that cached spellcheck results follow updates to a record
+    '''
+    faulty_skill = {
+        "name": "Pyhton",
+        "proficiency": "2-4 years",
+        "logo": "example-logo.png"
+    }
+
+    post_response = app.test_client().post('/resume/skill', json=faulty_skill)
+    assert post_response.status_code == 201
+    item_id = int(post_response.json['index'])
+
+    first = app.test_client().get('/resume/').json
+    assert {"before": "Pyhton", "after": "Python"} in first
+    assert app.test_client().get('/resume/').json == first
+
+    fixed_skill = dict(faulty_skill, name="Python")
+    put_response = app.test_client().put(f'/resume/skill/{item_id}', json=fixed_skill)
+    assert put_response.status_code == 200
+
+    second = app.test_client().get('/resume/').json
+    assert {"before": "Pyhton", "after": "Python"} not in second
+
+    delete_response = app.test_client().delete(f'/resume/skill/{item_id}')
+    assert delete_response.status_code == 200
+
+
+def test_correction_cache():
+    '''
+    Checks hit, miss and eviction counting of the correction cache
+    '''
+    cache = CachedSpellChecker(SpellChecker(), maxsize=2)
+    assert cache.correction("comapny") == "company"
+    assert cache.correction("comapny") == "company"
+    cache.warmup(["writting", "pyhton"])
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 3
+    assert stats["evictions"] == 1
+    assert stats["size"] == 2
+
+
+def test_lazy_warmup(tmp_path, monkeypatch):
+    '''
+    Checks that the warm-up word list fills the correction cache when a
+    lazy dictionary is first loaded
+    '''
+    word_list = tmp_path / 'warmup.txt'
+    word_list.write_text("comapny writting", encoding='utf-8')
+    monkeypatch.setenv('SPELLCHECK_WARMUP_FILE', str(word_list))
+    checker = SpellChecker()
+    monkeypatch.setattr(app_module, 'load_spell', lambda: checker)
+    spell = CachedSpellChecker(Lazy(app_module.load_warm_spell))
+    monkeypatch.setattr(app_module, 'spell', spell)
+
+    assert spell.unknown(["comapny"]) == {"comapny"}
+    assert spell.stats()["size"] == 2
+    assert spell.correction("comapny") == "company"
+    assert spell.stats()["hits"] == 1
+
+
+def test_parallel_spellcheck():
+    '''
+    Checks that the process pool returns the same corrections, in the
+    same order, as the serial path
+    '''
+    sections = {
+        "experience": [Experience("Sofware Developer", "A Cool Comapny", "October 2022",
+                                  "Present", "Writting Pyhton Code", "example-logo.png")] * 5,
+        "education": [Education("Enginering", "Universty of Tech", "September 2019",
+                                "July 2022", "80%", "example-logo.png")] * 5,
+        "skill": [Skill("Javascrpt", "1-2 Years", "example-logo.png")] * 5
+    }
+    spell = SpellChecker()
+    serial = SpellcheckEngine(spell).corrections(sections)
+
+    parallel_engine = SpellcheckEngine(spell, workers=2, chunk_size=2, parallel_threshold=1)
+    try:
+        assert parallel_engine.corrections(sections) == serial
+    finally:
+        parallel_engine.shutdown()
+
+
+def test_symspell_backend(tmp_path):
+    '''
+    Checks that the symmetric-delete backend finds the same corrections
+    as pyspellchecker over the same dictionary, and serves pool workers
+    from the index file
+    '''
+    full = SpellChecker().word_frequency.dictionary
+    frequencies = dict(sorted(full.items(), key=lambda item: -item[1])[:20000])
+    reference = SpellChecker(language=None)
+    reference.word_frequency.load_json(frequencies)
+    path = str(tmp_path / "symspell.idx")
+    build_index(path, frequencies)
+    symspell = SymSpellChecker(path)
+
+    words = ["comapny", "writting", "pyhton", "sofware", "enginering", "universty",
+             "managment", "develpment", "xqzvw", "2024", "python"]
+    assert symspell.unknown(words) == reference.unknown(words)
+    for word in words:
+        assert symspell.correction(word) == reference.correction(word)
+
+    texts = ["A Cool COMAPNY", "Writting Pyhton Code", "Sofware Enginering"]
+    assert check_texts(symspell, texts) == check_texts(reference, texts)
+    symspell.close()
+
+    sections = {
+        "experience": [Experience("Sofware Developer", "A Cool Comapny", "October 2022",
+                                  "Present", "Writting Pyhton Code", "example-logo.png")] * 5,
+        "education": [],
+        "skill": [Skill("Javascrpt", "1-2 Years", "example-logo.png")] * 5
+    }
+    loader = spellchecker_loader("symspell", path)
+    serial = SpellcheckEngine(reference).corrections(sections)
+    parallel_engine = SpellcheckEngine(loader(), workers=2, chunk_size=2, parallel_threshold=1,
+                                       loader=loader)
+    try:
+        assert parallel_engine.corrections(sections) == serial
+    finally:
+        parallel_engine.shutdown()
+
+
+def test_spellcheck_ndjson():
+    '''
+    Checks that the streamed corrections match the JSON response
+    '''
+    response = app.test_client().get('/resume/', headers={'Accept': 'application/x-ndjson'})
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+
+    lines = response.get_data(as_text=True).splitlines()
+    assert [json.loads(line) for line in lines] == app.test_client().get('/resume/').json
+
+
+def test_collection_etag():
+    '''
+    Checks that unchanged collections are answered with 304 and that a
+    write changes the ETag
+    '''
+    first = app.test_client().get('/resume/skill')
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+
+    not_modified = app.test_client().get('/resume/skill', headers={'If-None-Match': etag})
+    assert not_modified.status_code == 304
+    assert not_modified.data == b''
+
+    example_skill = {
+        "name": "Go",
+        "proficiency": "1-2 Years",
+        "logo": "example-logo.png"
+    }
+    item_id = int(app.test_client().post('/resume/skill', json=example_skill).json['index'])
+
+    modified = app.test_client().get('/resume/skill', headers={'If-None-Match': etag})
+    assert modified.status_code == 200
+    assert modified.headers['ETag'] != etag
+    assert dict(example_skill, logo=EXAMPLE_LOGO_URL) in modified.json
+
+    app.test_client().delete(f'/resume/skill/{item_id}')
+
+
+def test_response_compression(monkeypatch):
+    '''
+    Checks that collections are sent compressed once large enough, with
+    an ETag of their own, and that streamed bodies are compressed too
+    '''
+    client = app.test_client()
+    gzipped = {'Accept-Encoding': 'gzip'}
+    plain = client.get('/resume/skill')
+    monkeypatch.setattr(app_module.compressor, 'min_size', len(plain.data) + 1)
+    small = client.get('/resume/skill', headers=gzipped)
+    assert 'Content-Encoding' not in small.headers
+    assert 'Accept-Encoding' in small.headers['Vary']
+
+    monkeypatch.setattr(app_module.compressor, 'min_size', 0)
+    response = client.get('/resume/skill', headers=gzipped)
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.data) == plain.data
+    assert response.headers['ETag'] not in (plain.headers['ETag'], small.headers['ETag'])
+    not_modified = client.get('/resume/skill', headers=dict(
+        gzipped, **{'If-None-Match': response.headers['ETag']}))
+    assert not_modified.status_code == 304
+    refused = client.get('/resume/skill', headers={'Accept-Encoding': 'gzip;q=0'})
+    assert 'Content-Encoding' not in refused.headers and refused.data == plain.data
+
+    # Uncached bodies are compressed per request
+    projected = client.get('/resume/skill?fields=name', headers=gzipped)
+    assert projected.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(projected.data)) == client.get(
+        '/resume/skill?fields=name').json
+
+    streamed = client.get('/resume/', headers=dict(gzipped, Accept='application/x-ndjson'))
+    assert streamed.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in streamed.headers
+    lines = zlib.decompress(streamed.data, wbits=31).decode('utf-8').splitlines()
+    assert [json.loads(line) for line in lines] == client.get('/resume/').json
+
+    # Every chunk is flushed, so it can be decoded as soon as it arrives
+    chunks = ['{"a": 1}\n', '{"b": 2}\n']
+    compressed = list(compress_stream(chunks, 'gzip'))
+    decoder = zlib.decompressobj(wbits=31)
+    assert decoder.decompress(compressed[0]) == b'{"a": 1}\n'
+    assert decoder.decompress(b''.join(compressed[1:])) == b'{"b": 2}\n'
+
+
+def test_experience_pagination():
+    '''
+    Walks the experiences page by page with a projection and checks that
+    a delete behind the cursor does not skip or repeat items
+    '''
+    ids = []
+    for number in range(3):
+        example_experience = {
+            "title": f"Developer {number}",
+            "company": "Paged Company",
+            "start_date": "October 2022",
+            "end_date": "Present",
+            "description": "Writing Python Code",
+            "logo": "example-logo.png"
+        }
+        response = app.test_client().post('/resume/experience', json=example_experience)
+        ids.append(int(response.json['id']))
+
+    expected = [{'title': exp['title'], 'company': exp['company']}
+                for exp in app.test_client().get('/resume/experience').json]
+
+    # The three new experiences are the last items of the list
+    limit = len(expected) - 1
+    first = app.test_client().get(f'/resume/experience?limit={limit}&fields=title,company')
+    assert first.status_code == 200
+    assert [{key: item[key] for key in ('title', 'company')}
+            for item in first.json['items']] == expected[:limit]
+    assert [item['id'] for item in first.json['items'][-2:]] == ids[:2]
+
+    # Deleting an item already returned must not shift the next page
+    app.test_client().delete(f'/resume/experience/{ids[0]}')
+
+    items = []
+    cursor = first.json['next_cursor']
+    while cursor:
+        page = app.test_client().get(
+            f'/resume/experience?limit=2&fields=title,company&cursor={cursor}')
+        items.extend(page.json['items'])
+        cursor = page.json['next_cursor']
+    assert items == [dict(expected[-1], id=ids[2])]
+
+    bad_fields = app.test_client().get('/resume/experience?fields=salary')
+    assert bad_fields.status_code == 400
+
+    for item_id in ids[1:]:
+        app.test_client().delete(f'/resume/experience/{item_id}')
+
+
+def test_stable_ids():
+    '''
+    Checks that deleting a record does not change the ID of later records
+    '''
+    first_id = int(app.test_client().post('/resume/skill', json={
+        "name": "Rust", "proficiency": "1-2 Years", "logo": "example-logo.png"
+    }).json['index'])
+    second_id = int(app.test_client().post('/resume/skill', json={
+        "name": "Go", "proficiency": "1-2 Years", "logo": "example-logo.png"
+    }).json['index'])
+
+    assert app.test_client().delete(f'/resume/skill/{first_id}').status_code == 200
+    assert app.test_client().get(f'/resume/skill/{first_id}').status_code == 404
+    assert app.test_client().get(f'/resume/skill/{second_id}').json['name'] == "Go"
+
+    third_id = int(app.test_client().post('/resume/skill', json={
+        "name": "Zig", "proficiency": "1-2 Years", "logo": "example-logo.png"
+    }).json['index'])
+    assert third_id > second_id
+
+    app.test_client().delete(f'/resume/skill/{second_id}')
+    app.test_client().delete(f'/resume/skill/{third_id}')
+
+
+def test_sqlite_store(tmp_path):
+    '''
+    Checks that the SQLite store behaves like the in-memory lists and
+    keeps its records when it is opened again
+    '''
+    path = str(tmp_path / 'resume.db')
+    store = SQLiteStore(path)
+    python = Skill("Python", "1-2 Years", "example-logo.png")
+    store.seed({"skill": [python]})
+    store.seed({"skill": [python]})
+    assert list(store['skill']) == [python]
+
+    go_skill = Skill("Go", "1-2 Years", "example-logo.png")
+    go_id = store['skill'].add(go_skill)
+    assert store['skill'].replace(0, Skill("Python", "3-4 Years", "example-logo.png"))
+    version = store['skill'].version
+    assert store['skill'].remove(go_id) == go_skill
+    assert store['skill'].version == version + 1
+    assert store['skill'].remove(go_id) is None
+    assert not store['skill'].replace(go_id, go_skill)
+    # Missed writes leave the version alone, as in the in-memory store
+    assert store['skill'].version == version + 1
+    assert store['skill'].page(None, 10) == [(0, store['skill'][0])]
+    store.close()
+
+    reopened = SQLiteStore(path)
+    assert len(reopened['skill']) == 1
+    assert reopened['skill'][0].proficiency == "3-4 Years"
+    assert reopened['skill'].add(go_skill) == go_id + 1
+    reopened.close()
+
+
+def test_skill_batch():
+    '''
+    Applies a batch of skill operations and checks that an invalid batch
+    changes nothing
+    '''
+    created = app.test_client().post('/resume/skill:batch', json=[
+        {"op": "create", "data": {"name": "Rust", "proficiency": "1-2 Years"}},
+        {"op": "create", "data": {"name": "Go", "proficiency": "1-2 Years"}}
+    ])
+    assert created.status_code == 200
+    rust_id, go_id = [result['id'] for result in created.json['results']]
+    assert [result['status'] for result in created.json['results']] == [201, 201]
+
+    invalid = app.test_client().post('/resume/skill:batch', json=[
+        {"op": "delete", "id": rust_id},
+        {"op": "update", "id": go_id, "data": {"name": "Go"}}
+    ])
+    assert invalid.status_code == 400
+    assert [result['status'] for result in invalid.json['results']] == [200, 400]
+    assert app.test_client().get(f'/resume/skill/{rust_id}').status_code == 200
+
+    not_an_id = app.test_client().post('/resume/skill:batch', json=[{"op": "delete", "id": True}])
+    assert not_an_id.json['results'][0]['status'] == 404
+
+    lines = [
+        {"op": "update", "id": go_id, "data": {"name": "Go", "proficiency": "3-4 Years"}},
+        {"op": "delete", "id": rust_id}
+    ]
+    applied = app.test_client().post('/resume/skill:batch',
+                                     data='\n'.join(json.dumps(line) for line in lines),
+                                     content_type='application/x-ndjson')
+    assert applied.status_code == 200
+    assert app.test_client().get(f'/resume/skill/{rust_id}').status_code == 404
+    assert app.test_client().get(f'/resume/skill/{go_id}').json['proficiency'] == "3-4 Years"
+
+    app.test_client().delete(f'/resume/skill/{go_id}')
+
+
+def test_malformed_batch():
+    '''
+    Checks that a batch body that is not valid JSON gets the JSON 400
+    body of every write route, whatever its content type
+    '''
+    for content_type in ('application/json', 'text/plain', 'application/x-ndjson'):
+        response = app.test_client().post('/resume/skill:batch', data='[{"op":',
+                                          content_type=content_type)
+        assert response.status_code == 400
+        assert response.json == {'error': 'Invalid JSON', 'fields': []}
+
+
+class StubClient:  # pylint: disable=too-few-public-methods
+    '''
+    Stands in for the Gemini client, blocking until released
+    '''
+
+    def __init__(self, text="- First suggestion\n- Second suggestion\n"):
+        self.text = text
+        self.calls = 0
+        self.release = threading.Event()
+
+    def generate(self, prompt, max_output_tokens=None):  # pylint: disable=unused-argument
+        '''
+        Returns the canned text once released
+        '''
+        self.calls += 1
+        self.release.wait(5)
+        return self.text
+
+
+def test_suggestion_coalescing():
+    '''
+    Checks that concurrent requests for the same prompt share one call
+    and that the queue depth is bounded
+    '''
+    stub = StubClient()
+    service = SuggestionService(lambda: stub, workers=2, max_queue=1, timeout=5)
+    try:
+        futures = [service.submit("Same prompt") for _ in range(3)]
+        with pytest.raises(SuggestionQueueFull):
+            service.submit("Other prompt")
+        stub.release.set()
+
+        assert [future.result() for future in futures] == [
+            ["First suggestion", "Second suggestion"]] * 3
+        assert stub.calls == 1
+    finally:
+        service.shutdown()
+
+
+def test_experience_suggestions():
+    '''
+    Gets suggestions for an experience through a stubbed client
+    '''
+    stub = StubClient()
+    stub.release.set()
+    app_module.suggestion_service.client = stub
+    try:
+        response = app.test_client().get('/resume/experience/0/suggestions')
+        assert response.status_code == 200
+        assert response.json['suggestions'] == ["First suggestion", "Second suggestion"]
+
+        missing = app.test_client().get('/resume/experience/999999/suggestions')
+        assert missing.status_code == 404
+    finally:
+        app_module.suggestion_service.client = None
+
+
+def test_suggestion_cache(tmp_path):
+    '''
+    Checks that suggestions are served from the cache, survive a restart
+    through the disk tier and that empty results are not cached
+    '''
+    path = str(tmp_path / 'suggestions.db')
+    stub = StubClient()
+    stub.release.set()
+    service = SuggestionService(lambda: stub, cache=SuggestionCache(path=path))
+    try:
+        assert service.suggest("Describe me") == ["First suggestion", "Second suggestion"]
+        assert service.suggest("Describe me") == ["First suggestion", "Second suggestion"]
+        assert stub.calls == 1
+        assert service.cache.stats()["hit_ratio"] == 0.5
+
+        stub.text = ""
+        assert not service.suggest("Empty answer")
+        assert service.cache.stats()["disk_entries"] == 1
+    finally:
+        service.cache.close()
+        service.shutdown()
+
+    restarted = SuggestionCache(path=path)
+    assert restarted.get(service.cache_key("Describe me")) == [
+        "First suggestion", "Second suggestion"]
+    restarted.close()
+
+
+def test_suggestion_cache_eviction(tmp_path):
+    '''
+    Checks that expired suggestions are deleted from disk every
+    evict_every stores and when the cache is opened
+    '''
+    path = str(tmp_path / 'suggestions.db')
+    cache = SuggestionCache(ttl=0.05, path=path, evict_every=2)
+    cache.put("first", ["A suggestion"])
+    time.sleep(0.1)
+    assert cache.get("first") is None
+    assert cache.stats()["disk_entries"] == 1
+
+    cache.put("second", ["Another suggestion"])
+    stats = cache.stats()
+    assert stats["disk_entries"] == 1 and stats["memory_entries"] == 1
+    cache.close()
+
+    time.sleep(0.1)
+    reopened = SuggestionCache(path=path)
+    assert reopened.stats()["disk_entries"] == 0
+    reopened.close()
+
+
+class FailingClient:  # pylint: disable=too-few-public-methods
+    '''
+    Stands in for a Gemini client that is not configured
+    '''
+
+    def generate(self, prompt, max_output_tokens=None):  # pylint: disable=unused-argument
+        '''
+        Fails like the SDK does without credentials
+        '''
+        raise RuntimeError("No API_KEY or ADC found")
+
+
+def test_experience_suggestions_batch():
+    '''
+    Gets suggestions for several experiences from one stubbed call and
+    reports unknown IDs and missing answers per ID
+    '''
+    second_id = int(app.test_client().post('/resume/experience', json={
+        "title": "Tester",
+        "company": "A Cool Company",
+        "start_date": "October 2022",
+        "end_date": "Present",
+        "description": "Testing Python Code",
+        "logo": "example-logo.png"
+    }).json['id'])
+    third_id = int(app.test_client().post('/resume/experience', json={
+        "title": "Writer",
+        "company": "A Cool Company",
+        "start_date": "October 2022",
+        "end_date": "Present",
+        "description": "Writing documentation",
+        "logo": "example-logo.png"
+    }).json['id'])
+
+    stub = StubClient(f"### Experience 0\n- Use numbers\n"
+                      f"### Experience {second_id}\n- Name the tools\n")
+    stub.release.set()
+    app_module.suggestion_service.client = stub
+    try:
+        response = app.test_client().post('/resume/experience/suggestions',
+                                          json={"ids": [0, second_id, third_id, 999999]})
+        assert response.status_code == 200
+        assert response.json['results'] == [
+            {"id": 0, "suggestions": ["Use numbers"]},
+            {"id": second_id, "suggestions": ["Name the tools"]},
+            {"id": third_id, "error": "No suggestions returned"},
+            {"id": 999999, "error": "Experience not found"}
+        ]
+        assert stub.calls == 1
+
+        assert app.test_client().post('/resume/experience/suggestions',
+                                      json={"ids": [True]}).status_code == 400
+
+        # Upstream errors are logged, not sent to the client
+        app_module.suggestion_service.client = FailingClient()
+        response = app.test_client().post('/resume/experience/suggestions',
+                                          json={"ids": [third_id]})
+        assert response.json['results'] == [
+            {"id": third_id, "error": "Failed to generate suggestions"}]
+    finally:
+        app_module.suggestion_service.client = None
+        app.test_client().delete(f'/resume/experience/{second_id}')
+        app.test_client().delete(f'/resume/experience/{third_id}')
+
+
+def test_search():
+    '''
+    Searches records by words of their text fields and checks that the
+    index follows updates and deletes
+    '''
+    example_experience = {
+        "title": "Data Engineer",
+        "company": "Pipeline Works",
+        "start_date": "October 2022",
+        "end_date": "Present",
+        "description": "Building streaming pipelines in Kafka",
+        "logo": "example-logo.png"
+    }
+    item_id = int(app.test_client().post('/resume/experience', json=example_experience).json['id'])
+
+    response = app.test_client().get('/resume/search?q=kafka%20engineer')
+    assert response.status_code == 200
+    assert response.json == [{
+        "section": "experience",
+        "id": item_id,
+        "fields": ["description", "title"],
+        "data": dict(example_experience, logo=EXAMPLE_LOGO_URL)
+    }]
+
+    updated_experience = dict(example_experience, description="Building batch pipelines")
+    app.test_client().put(f'/resume/experience/{item_id}', json=updated_experience)
+    assert app.test_client().get('/resume/search?q=kafka').json == []
+    assert len(app.test_client().get('/resume/search?q=pipelines').json) == 1
+
+    app.test_client().delete(f'/resume/experience/{item_id}')
+    assert app.test_client().get('/resume/search?q=pipelines').json == []
+
+
+def test_search_after_batch(monkeypatch):
+    '''
+    Checks that a batch keeps the index in step with the store, so the
+    next search does not re-index the section
+    '''
+    app.test_client().get('/resume/search?q=warmup')
+    created = app.test_client().post('/resume/skill:batch', json=[
+        {"op": "create", "data": {"name": f"Elixir {number}", "proficiency": "1 Year"}}
+        for number in range(3)
+    ]).json['results']
+    ids = [result['id'] for result in created]
+    try:
+        indexed = []
+        text_index = app_module.text_index
+        original = text_index._add  # pylint: disable=protected-access
+        monkeypatch.setattr(text_index, '_add',
+                            lambda *args: indexed.append(args) or original(*args))
+        assert len(app.test_client().get('/resume/search?q=elixir').json) == 3
+        assert not indexed
+    finally:
+        for skill_id in ids:
+            app.test_client().delete(f'/resume/skill/{skill_id}')
+    assert app.test_client().get('/resume/search').status_code == 400
+
+
+@pytest.mark.parametrize('use_orjson', [True, False])
+def test_json_provider(use_orjson, monkeypatch):
+    '''
+    Checks that models are encoded the same way with and without orjson
+    '''
+    if use_orjson and not FastJSONProvider.use_orjson:
+        pytest.skip('orjson is not installed')
+    monkeypatch.setattr(app.json, 'use_orjson', use_orjson)
+
+    skill = Skill("Python", "1-2 Years", "example-logo.png")
+    assert json.loads(app.json.dumps([skill])) == [skill.to_dict()]
+    assert json.loads(app.json.dumps_bytes({"skills": [skill]})) == {"skills": [skill.to_dict()]}
+
+
+def test_lazy_initialization():
+    '''
+    Checks that lazy values are built once on first use and that the
+    preload modes build them up front
+    '''
+    calls = []
+    spell = CachedSpellChecker(Lazy(lambda: calls.append(1) or SpellChecker()), maxsize=10)
+    assert not spell.loaded and not calls
+
+    threads = [threading.Thread(target=spell.unknown, args=(["speling"],)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert spell.loaded and calls == [1]
+
+    value = Lazy(object)
+    preload("background", [value.get]).join()
+    assert value.loaded
+    value = Lazy(object)
+    assert preload("eager", [value.get]) is None and value.loaded
+    value = Lazy(object)
+    assert preload("lazy", [value.get]) is None and not value.loaded
+    with pytest.raises(ValueError):
+        preload("sometimes", [])
+
+
+def test_metrics(monkeypatch):
+    '''
+    Checks that request and hot-path timings are exported once enabled,
+    and that ?profile=1 returns a profile summary when profiling is on
+    '''
+    metrics = app_module.metrics
+    assert app.test_client().get('/metrics').status_code == 404
+
+    monkeypatch.setattr(metrics, 'enabled', True)
+    metrics.clear()
+    skill_id = app.test_client().post('/resume/skill', json={
+        "name": "Typescirpt", "proficiency": "1-2 Years", "logo": "example-logo.png"}).json['index']
+    try:
+        app.test_client().get('/resume/').close()
+
+        response = app.test_client().get('/metrics')
+        assert response.status_code == 200
+        assert response.content_type.startswith('text/plain; version=0.0.4')
+        text = response.get_data(as_text=True)
+        assert ('resume_request_duration_seconds_count'
+                '{method="GET",endpoint="spellcheck",status="200"} 1') in text
+        for operation in ('spellcheck.tokenize', 'spellcheck.unknown', 'spellcheck.correction',
+                          'json.encode'):
+            assert f'resume_operation_duration_seconds_count{{operation="{operation}"}}' in text
+        assert 'le="+Inf"' in text
+
+        monkeypatch.setattr(app_module, 'PROFILING_ENABLED', True)
+        response = app.test_client().get('/resume/?profile=1')
+        assert response.status_code == 200
+        assert response.headers['X-Profiled-Status'] == '200'
+        assert 'cumulative' in response.get_data(as_text=True)
+        assert app.test_client().get('/resume/').is_json
+    finally:
+        app.test_client().delete(f'/resume/skill/{skill_id}')
+
+
+@pytest.mark.parametrize('backend', ['memory', 'sqlite'])
+def test_concurrent_writes(backend, tmp_path):
+    '''
+    Adds records from many threads at once, with readers iterating the
+    section meanwhile, and checks that every ID is handed out once
+    '''
+    store = MemoryStore() if backend == 'memory' else SQLiteStore(str(tmp_path / 'resume.db'))
+    skill = Skill("Python", "1-2 Years", "example-logo.png")
+    ids = []
+    errors = []
+    done = threading.Event()
+
+    def write():
+        try:
+            ids.extend(store['skill'].add(skill) for _ in range(200))
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            errors.append(error)
+
+    def read():
+        try:
+            while not done.is_set():
+                assert all(record == skill for record in store['skill'])
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            errors.append(error)
+
+    writers = [threading.Thread(target=write) for _ in range(8)]
+    readers = [threading.Thread(target=read) for _ in range(2)]
+    # Switching threads often makes interleaved writes much more likely
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for thread in writers + readers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        done.set()
+        for thread in readers:
+            thread.join()
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+    assert not errors
+    assert sorted(ids) == list(range(1600))
+    assert len(store['skill']) == 1600
+    assert store['skill'].version == 1600
+    if backend == 'sqlite':
+        store.close()
+
+
+def test_section_locks():
+    '''
+    Checks that a writer holding one section does not block readers of it
+    or writers to another section
+    '''
+    store = MemoryStore()
+    skill = Skill("Python", "1-2 Years", "example-logo.png")
+    store['skill'].add(skill)
+    assert list(store['skill']) == [skill]
+    with store['skill'].lock:
+        worker = threading.Thread(target=lambda: (list(store['skill']), store['skill'][0],
+                                                  store['skill'].page(None, 10),
+                                                  store['experience'].add(skill)))
+        worker.start()
+        worker.join(timeout=5)
+        assert not worker.is_alive()
+    assert len(store['experience']) == 1
+
+
+def test_concurrent_posts():
+    '''
+    Posts skills from many threads and checks that every client gets a
+    different ID
+    '''
+    example_skill = {"name": "Rust", "proficiency": "1 Year", "logo": "example-logo.png"}
+    ids = []
+
+    def post():
+        client = app.test_client()
+        for _ in range(25):
+            ids.append(client.post('/resume/skill', json=example_skill).json['index'])
+
+    threads = [threading.Thread(target=post) for _ in range(8)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(set(ids)) == len(ids) == 200
+        assert all(data['skill'][skill_id].name == "Rust" for skill_id in ids)
+    finally:
+        for skill_id in ids:
+            app.test_client().delete(f'/resume/skill/{skill_id}')
+
+
+def test_wal_store(tmp_path):
+    '''
+    Checks that the write-ahead logged store comes back with the same
+    records, IDs and versions after a restart, from the log alone, from a
+    snapshot plus the log tail, and with a torn frame at the end of the log
+    '''
+    path = str(tmp_path / 'resume.db')
+    python = Skill("Python", "1-2 Years", "example-logo.png")
+    go_skill = Skill("Go", "1-2 Years", "example-logo.png")
+
+    def reopen(store, **options):
+        expected = {section: (list(store[section].items()), store[section].version)
+                    for section in store}
+        store.close()
+        store = DurableMemoryStore(path, fsync="always", **options)
+        assert {section: (list(store[section].items()), store[section].version)
+                for section in store} == expected
+        return store
+
+    store = DurableMemoryStore(path, fsync="always")
+    store.seed({"skill": [python]})
+    go_id = store['skill'].add(go_skill)
+    store['skill'].replace(0, Skill("Python", "3-4 Years", "example-logo.png"))
+    store['skill'].apply([("create", None, python), ("delete", go_id, None)])
+    store = reopen(store)
+    store.seed({"skill": [python]})
+    assert store['skill'].add(go_skill) == go_id + 2
+
+    store.compact()
+    assert os.path.exists(f"{path}.snapshot")
+    assert store.log_generations() == [store.generation]
+    store['skill'].remove(go_id + 2)
+    store = reopen(store)
+
+    with open(store.log_path(store.generation), 'ab') as log_file:
+        log_file.write(b"\x10\x00\x00\x00torn")
+    store = reopen(store)
+    store['skill'].add(go_skill)
+    store = reopen(store, snapshot_every=3)
+
+    for _ in range(3):
+        store['experience'].add(Experience("Developer", "A Cool Company", "October 2022",
+                                           "Present", "Writing Python code", "logo.png"))
+    deadline = time.monotonic() + 5
+    while store.log_generations() != [2] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert store.generation == 2
+    store = reopen(store)
+    store.close()
+
+
+def test_tenant_shards(tmp_path, monkeypatch):
+    '''
+    Checks that each user gets their own resume, served by the shard
+    process owning them, and that the hash ring only moves users to a
+    new shard when one is added
+    '''
+    ring, larger = HashRing(range(2)), HashRing(range(3))
+    users = [f"user-{number}" for number in range(1000)]
+    assert {ring.node(uid) for uid in users} == {0, 1}
+    moved = [uid for uid in users if ring.node(uid) != larger.node(uid)]
+    assert all(larger.node(uid) == 2 for uid in moved)
+    assert 200 < len(moved) < 470
+
+    lock_path = str(tmp_path / 'shards.lock')
+    cluster = start_shards(2, str(tmp_path), lock_path=lock_path)
+    monkeypatch.setattr(app_module, 'tenant_shards', Lazy(lambda: cluster))
+    try:
+        # Another app process cannot start a second set of shards
+        with pytest.raises(ShardUnavailable):
+            start_shards(1, str(tmp_path / 'other'), lock_path=lock_path)
+
+        client = app.test_client()
+        alice = [uid for uid in users if ring.node(uid) == 0][0]
+        bob = [uid for uid in users if ring.node(uid) == 1][0]
+        skill = {"name": "Pyhton", "proficiency": "1-2 Years"}
+        response = client.post(f'/users/{alice}/resume/skill', json=skill)
+        assert response.status_code == 201
+        skill_id = int(response.json['id'])
+        assert client.post(f'/users/{bob}/resume/skill',
+                           json={"name": "Go", "proficiency": "1 Year"}).status_code == 201
+        assert client.post(f'/users/{bob}/resume/skill', json={"name": "Go"}).status_code == 400
+
+        assert client.get(f'/users/{alice}/resume/skill').json == [
+            dict(skill, logo=EXAMPLE_LOGO_URL, id=skill_id)]
+        assert [item["name"] for item in client.get(f'/users/{bob}/resume/skill').json] == ["Go"]
+        assert client.get(f'/users/{alice}/resume/spellcheck').json == [
+            {"before": "Pyhton", "after": "Python"}]
+        assert client.get(f'/users/{bob}/resume/spellcheck').json == []
+
+        renamed = dict(skill, name="Python", logo="logo.png")
+        assert client.put(f'/users/{alice}/resume/skill/{skill_id}', json=renamed).json == renamed
+        assert client.get(f'/users/{alice}/resume/skill/{skill_id}').json == renamed
+        assert client.get(f'/users/{alice}/resume/spellcheck').json == []
+        assert client.get(f'/users/{alice}/resume/education/0').status_code == 404
+        assert client.delete(f'/users/{alice}/resume/skill/{skill_id}').status_code == 200
+        assert client.delete(f'/users/{alice}/resume/skill/{skill_id}').status_code == 404
+
+        cluster.processes[0].terminate()
+        cluster.processes[0].join()
+        assert client.get(f'/users/{alice}/resume/skill').status_code == 503
+        assert client.get(f'/users/{bob}/resume/skill').status_code == 200
+    finally:
+        cluster.close()
+
+
+def test_assets(tmp_path):
+    '''
+    Uploads logos, checks that identical content is stored once, and that
+    assets are served with immutable cache headers and validators
+    '''
+    client = app.test_client()
+    with open(os.path.join(app.root_path, 'example-logo.png'), 'rb') as logo_file:
+        logo = logo_file.read()
+
+    response = client.post('/assets', data=logo, content_type='image/png')
+    assert response.status_code == 200
+    assert response.json['url'] == EXAMPLE_LOGO_URL
+    new_logo = logo + b"\0"
+    response = client.post('/assets', data={'file': (io.BytesIO(new_logo), 'logo.png')})
+    assert response.status_code == 201
+    digest = response.json['hash']
+    assert client.post('/assets', data=new_logo).json == {
+        'hash': digest, 'url': f'/assets/{digest}'}
+    assert client.post('/assets', data=b"GIF? no").status_code == 400
+
+    response = client.get(f'/assets/{digest}')
+    assert response.status_code == 200
+    assert response.data == new_logo
+    assert response.mimetype == 'image/png'
+    assert response.cache_control.immutable
+    assert response.cache_control.max_age == 365 * 24 * 3600
+    assert client.get(f'/assets/{digest}',
+                      headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+    assert client.get(f'/assets/{digest}?size=64').status_code == 200
+    assert client.get(f'/assets/{digest}?size=7').status_code == 400
+    assert client.get('/assets/' + '0' * 64).status_code == 404
+    assert client.get('/assets/..%2Fapp.py').status_code == 404
+
+    # Bundled files are served in place, and nothing is written before
+    # the first upload
+    bundled = AssetStore(str(tmp_path / 'bundled'))
+    bundled_digest = bundled.register_file(os.path.join(app.root_path, 'example-logo.png'))
+    assert bundled.path(bundled_digest) == (os.path.join(app.root_path, 'example-logo.png'),
+                                            'image/png')
+    assert bundled.put(logo) == (bundled_digest, False)
+    assert not os.path.exists(tmp_path / 'bundled')
+
+    store = AssetStore(str(tmp_path), thumbnail_sizes=(), cache_bytes=10)
+    store._render = lambda digest, size: (b"x" * size, 'image/png')  # pylint: disable=protected-access
+    for size in (4, 4, 5, 6):
+        assert store.thumbnail(digest, size) == (b"x" * size, 'image/png')
+    assert store.stats() == {"size": 1, "bytes": 6, "max_bytes": 10,
+                             "hits": 1, "misses": 3, "evictions": 2}
+
+
+def test_schema_validation():
+    '''
+    Checks that request bodies are decoded into models, and that every
+    write route answers invalid bodies with the same 400 body
+    '''
+    schema = Schema(Skill, lambda logo: logo or "default.png")
+    assert schema.decode(b'{"name": "Go", "proficiency": "1 Year", "extra": 1}') == Skill(
+        "Go", "1 Year", "default.png")
+    assert schema.from_dict({"name": "Go", "proficiency": "1 Year", "logo": "go.png"}) == Skill(
+        "Go", "1 Year", "go.png")
+    with pytest.raises(ValidationError) as raised:
+        schema.decode(b'{"name": "", "proficiency": 3}')
+    assert raised.value.to_dict() == {
+        "error": "Missing or invalid fields: ['name', 'proficiency']",
+        "fields": ["name", "proficiency"]
+    }
+    with pytest.raises(ValidationError):
+        schema.decode(b'[]')
+    with pytest.raises(ValidationError):
+        Schema(Skill).decode(b'{"name": "Go", "proficiency": "1 Year"}')
+
+    client = app.test_client()
+    skill_id = int(client.post('/resume/skill', json={"name": "Go", "proficiency": "1 Year"})
+                   .json['index'])
+    invalid = {"error": "Missing or invalid fields: ['proficiency']", "fields": ["proficiency"]}
+    for method, url in (('post', '/resume/skill'), ('put', f'/resume/skill/{skill_id}')):
+        response = getattr(client, method)(url, json={"name": "Go", "proficiency": None})
+        assert response.status_code == 400
+        assert response.json == invalid
+    response = client.post('/resume/education', json={"course": "Physics"})
+    assert response.status_code == 400
+    assert response.json["fields"] == ["school", "start_date", "end_date", "grade"]
+    response = client.post('/resume/experience', data=b'{"title": ',
+                           content_type='application/json')
+    assert response.status_code == 400
+    assert response.json == {"error": "Invalid JSON", "fields": []}
+    client.delete(f'/resume/skill/{skill_id}')
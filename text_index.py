@@ -0,0 +1,131 @@
+'''
+Inverted index over the text fields of the resume sections
+'''
+import re
+from threading import Lock
+
+from spellcheck import SPELLCHECK_FIELDS
+
+TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text):
+    '''
+    Returns the lowercase word tokens of a text
+    '''
+    return TOKEN.findall(text.lower())
+
+
+class TextIndex:
+    '''
+    Maps each token to its posting list: the (section, ID) pairs of the
+    records containing it, with the fields it appears in.
+
+    The write handlers keep the index up to date through record_added,
+    record_updated and record_removed. Writes made by another worker
+    process are caught by comparing store versions, in which case the
+    section is re-indexed from the store.
+    '''
+
+    def __init__(self, fields=None):
+        self.fields = fields or SPELLCHECK_FIELDS
+        self._postings = {}
+        self._forward = {}
+        self._versions = {}
+        self._lock = Lock()
+
+    def _add(self, section, record_id, record):
+        '''
+        Adds the tokens of a record to the posting lists
+        '''
+        tokens = {}
+        for field in self.fields[section]:
+            for token in tokenize(getattr(record, field)):
+                tokens.setdefault(token, set()).add(field)
+        for token, token_fields in tokens.items():
+            self._postings.setdefault(token, {})[(section, record_id)] = token_fields
+        self._forward[(section, record_id)] = tokens.keys()
+
+    def _remove(self, section, record_id):
+        '''
+        Removes the tokens of a record from the posting lists
+        '''
+        for token in self._forward.pop((section, record_id), ()):
+            postings = self._postings[token]
+            del postings[(section, record_id)]
+            if not postings:
+                del self._postings[token]
+
+    def _advance(self, section, version):
+        '''
+        Records the store version after a write made through the index.
+        A batch bumps the version once for all its operations, so the same
+        version is accepted again. A jump of more than one version means
+        another process wrote to the section, so it is marked for
+        re-indexing.
+        '''
+        previous = self._versions.get(section)
+        in_step = (version is not None and previous is not None
+                   and previous <= version <= previous + 1)
+        self._versions[section] = version if in_step else None
+
+    def record_added(self, section, record_id, record, version=None):
+        '''
+        Indexes a record added to a section
+        '''
+        with self._lock:
+            self._add(section, record_id, record)
+            self._advance(section, version)
+
+    def record_updated(self, section, record_id, record, version=None):
+        '''
+        Re-indexes a record that was replaced
+        '''
+        with self._lock:
+            self._remove(section, record_id)
+            self._add(section, record_id, record)
+            self._advance(section, version)
+
+    def record_removed(self, section, record_id, version=None):
+        '''
+        Drops a removed record from the index
+        '''
+        with self._lock:
+            self._remove(section, record_id)
+            self._advance(section, version)
+
+    def sync(self, data):
+        '''
+        Re-indexes every section whose store version differs from the
+        last version seen by the index
+        '''
+        for section in self.fields:
+            records = data[section]
+            version = getattr(records, 'version', None)
+            if version is not None and version == self._versions.get(section):
+                continue
+            with self._lock:
+                for section_key in [key for key in self._forward if key[0] == section]:
+                    self._remove(*section_key)
+                for record_id, record in records.items():
+                    self._add(section, record_id, record)
+                self._versions[section] = version
+
+    def search(self, query):
+        '''
+        Returns {(section, ID): fields} for the records containing every
+        token of the query, reading only the posting lists of those tokens
+        '''
+        tokens = set(tokenize(query))
+        if not tokens:
+            return {}
+        with self._lock:
+            postings = sorted((self._postings.get(token, {}) for token in tokens), key=len)
+            matches = {key: set(token_fields) for key, token_fields in postings[0].items()}
+            for posting in postings[1:]:
+                for key in list(matches):
+                    if key in posting:
+                        matches[key] |= posting[key]
+                    else:
+                        del matches[key]
+            return matches
@@ -0,0 +1,311 @@
+'''
+Write-ahead log and snapshot files for the in-memory store.
+
+Every write to a section is appended to the log as one frame holding its
+(op, ID, record) operations, so a batch is replayed all or nothing. A
+frame is its payload length and CRC32 followed by the payload; a torn or
+corrupt frame at the end of the log is dropped on recovery.
+
+Snapshots hold the whole store in a compact binary layout, with every
+distinct field value stored once, and are read through mmap. Each
+snapshot starts a new log generation, so recovery loads the latest
+snapshot and replays only the logs written after it.
+'''
+import mmap
+import os
+import struct
+import sys
+import threading
+import zlib
+from array import array
+from dataclasses import fields
+from itertools import accumulate
+from sys import intern
+
+FSYNC_POLICIES = ("always", "batch", "off")
+OPS = ("create", "update", "delete")
+
+FRAME = struct.Struct("<II")
+FRAME_SECTION = struct.Struct("<BI")
+OPERATION = struct.Struct("<Bq")
+LENGTH = struct.Struct("<I")
+STRING_TABLE = struct.Struct("<QQ")
+SNAPSHOT_HEADER = struct.Struct("<8sQ")
+SNAPSHOT_SECTION = struct.Struct("<QQQ")
+CHECKSUM = struct.Struct("<I")
+SNAPSHOT_MAGIC = b"RESUMES2"
+
+
+class CorruptSnapshot(ValueError):
+    '''
+    Raised when a snapshot file is truncated or fails its checksum
+    '''
+
+
+class RecordCodec:
+    '''
+    Encodes records as the UTF-8 values of their fields, each prefixed by
+    its length, for log frames, and describes the fixed-size snapshot row
+    of each section. Sections are identified in log frames by their
+    position in the models mapping.
+    '''
+
+    def __init__(self, models):
+        self.models = dict(models)
+        self.sections = list(self.models)
+        self.names = {section: tuple(field.name for field in fields(model))
+                      for section, model in self.models.items()}
+        self.rows = {section: struct.Struct("<q" + "I" * len(names))
+                     for section, names in self.names.items()}
+
+    def encode_values(self, section, record, parts):
+        '''
+        Appends the encoded field values of a record to parts
+        '''
+        for name in self.names[section]:
+            value = getattr(record, name).encode('utf-8')
+            parts.append(LENGTH.pack(len(value)))
+            parts.append(value)
+
+    def decode_record(self, section, buffer, offset):
+        '''
+        Returns the record encoded at offset and the offset following it
+        '''
+        values = []
+        for _ in self.names[section]:
+            (length,) = LENGTH.unpack_from(buffer, offset)
+            offset += LENGTH.size
+            values.append(str(buffer[offset:offset + length], 'utf-8'))
+            offset += length
+        return self.models[section](*values), offset
+
+    def encode_frame(self, section, operations):
+        '''
+        Returns the log frame of a write to a section
+        '''
+        parts = [FRAME_SECTION.pack(self.sections.index(section), len(operations))]
+        for op, record_id, record in operations:
+            parts.append(OPERATION.pack(OPS.index(op), record_id))
+            if op != "delete":
+                self.encode_values(section, record, parts)
+        payload = b"".join(parts)
+        return FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+
+    def decode_frame(self, payload):
+        '''
+        Returns the section and (op, ID, record) operations of a frame
+        '''
+        code, count = FRAME_SECTION.unpack_from(payload, 0)
+        section = self.sections[code]
+        offset = FRAME_SECTION.size
+        operations = []
+        for _ in range(count):
+            op_code, record_id = OPERATION.unpack_from(payload, offset)
+            offset += OPERATION.size
+            record = None
+            if OPS[op_code] != "delete":
+                record, offset = self.decode_record(section, payload, offset)
+            operations.append((OPS[op_code], record_id, record))
+        return section, operations
+
+
+def read_log(path, codec):
+    '''
+    Returns the (section, operations) writes of a log file and the length
+    of its valid prefix, stopping at the first torn or corrupt frame
+    '''
+    with open(path, 'rb') as log_file:
+        content = log_file.read()
+    writes = []
+    offset = 0
+    while offset + FRAME.size <= len(content):
+        length, checksum = FRAME.unpack_from(content, offset)
+        payload = content[offset + FRAME.size:offset + FRAME.size + length]
+        if len(payload) < length or zlib.crc32(payload) != checksum:
+            break
+        writes.append(codec.decode_frame(payload))
+        offset += FRAME.size + length
+    return writes, offset
+
+
+class WriteAheadLog:  # pylint: disable=too-many-instance-attributes
+    '''
+    Append-only log file. With the "always" policy every frame is fsynced
+    before the write returns; with "batch" a background thread fsyncs
+    the log every fsync_interval seconds when it changed; with "off" the
+    operating system decides when the data reaches the disk.
+    '''
+
+    def __init__(self, path, fsync="batch", fsync_interval=0.05):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy {fsync!r}, expected one of {FSYNC_POLICIES}")
+        self.path = path
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.frames = 0
+        self._fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._flusher = None
+        if fsync == "batch":
+            self._flusher = threading.Thread(target=self._flush_periodically,
+                                             name="wal-fsync", daemon=True)
+            self._flusher.start()
+
+    def append(self, frame):
+        '''
+        Appends one frame to the log
+        '''
+        with self._lock:
+            remaining = memoryview(frame)
+            while remaining:
+                remaining = remaining[os.write(self._fd, remaining):]
+            self.frames += 1
+            if self.fsync == "always":
+                os.fsync(self._fd)
+            else:
+                self._dirty = True
+
+    def sync(self):
+        '''
+        Flushes the log to disk if it changed since the last fsync
+        '''
+        with self._lock:
+            if self._dirty and self._fd is not None:
+                os.fsync(self._fd)
+                self._dirty = False
+
+    def _flush_periodically(self):
+        '''
+        Runs the batched fsyncs until the log is closed
+        '''
+        while not self._closed.wait(self.fsync_interval):
+            self.sync()
+
+    def close(self):
+        '''
+        Flushes and closes the log
+        '''
+        self._closed.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        with self._lock:
+            if self._fd is not None:
+                if self.fsync != "off":
+                    os.fsync(self._fd)
+                os.close(self._fd)
+                self._fd = None
+
+
+def fsync_directory(path):
+    '''
+    Makes a rename or deletion in the directory of path durable
+    '''
+    if hasattr(os, 'O_DIRECTORY'):
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def write_snapshot(path, codec, generation, state):  # pylint: disable=too-many-locals
+    '''
+    Atomically replaces the snapshot at path by the given state, a dict
+    of section to (next ID, version, (ID, record) pairs).
+
+    Field values are stored once in a string table, and each record is a
+    fixed-size row of its ID and the table indexes of its values.
+    '''
+    strings = {}
+    sections = []
+    for section in codec.sections:
+        next_id, version, items = state[section]
+        row = codec.rows[section]
+        names = codec.names[section]
+        rows = b"".join(row.pack(record_id, *[strings.setdefault(getattr(record, name),
+                                                                 len(strings))
+                                              for name in names])
+                        for record_id, record in items)
+        sections.append((SNAPSHOT_SECTION.pack(next_id, version, len(items)), rows))
+    text = "".join(strings).encode('utf-8')
+    offsets = array('Q', accumulate(map(len, strings), initial=0))
+    if sys.byteorder == 'big':
+        offsets.byteswap()
+
+    temporary = f"{path}.tmp"
+    checksum = 0
+    with open(temporary, 'wb') as snapshot:
+        for chunk in (SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, generation),
+                      STRING_TABLE.pack(len(strings), len(text)), offsets.tobytes(), text,
+                      *(part for section in sections for part in section)):
+            checksum = zlib.crc32(chunk, checksum)
+            snapshot.write(chunk)
+        snapshot.write(CHECKSUM.pack(checksum))
+        snapshot.flush()
+        os.fsync(snapshot.fileno())
+    os.replace(temporary, path)
+    fsync_directory(path)
+
+
+def read_snapshot(path, codec):
+    '''
+    Returns (generation, state) from a snapshot file mapped into memory,
+    or None when there is no snapshot
+    '''
+    try:
+        snapshot = open(path, 'rb')  # pylint: disable=consider-using-with
+    except FileNotFoundError:
+        return None
+    with snapshot:
+        size = os.fstat(snapshot.fileno()).st_size
+        if size < SNAPSHOT_HEADER.size + CHECKSUM.size:
+            raise CorruptSnapshot(f"{path} is truncated")
+        with mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                return parse_snapshot(path, codec, view)
+            finally:
+                view.release()
+
+
+def parse_snapshot(path, codec, view):  # pylint: disable=too-many-locals
+    '''
+    Decodes the content of a snapshot file
+    '''
+    body = view[:-CHECKSUM.size]
+    try:
+        (expected,) = CHECKSUM.unpack_from(view, len(body))
+        if zlib.crc32(body) != expected:
+            raise CorruptSnapshot(f"{path} fails its checksum")
+        magic, generation = SNAPSHOT_HEADER.unpack_from(body, 0)
+        if magic != SNAPSHOT_MAGIC:
+            raise CorruptSnapshot(f"{path} is not a snapshot")
+
+        offset = SNAPSHOT_HEADER.size
+        count, text_size = STRING_TABLE.unpack_from(body, offset)
+        offset += STRING_TABLE.size
+        offsets = array('Q')
+        offsets.frombytes(body[offset:offset + offsets.itemsize * (count + 1)])
+        if sys.byteorder == 'big':
+            offsets.byteswap()
+        offset += offsets.itemsize * (count + 1)
+        text = str(body[offset:offset + text_size], 'utf-8')
+        offset += text_size
+        strings = [intern(text[start:end]) for start, end in zip(offsets, offsets[1:])]
+
+        state = {}
+        for section in codec.sections:
+            next_id, version, records = SNAPSHOT_SECTION.unpack_from(body, offset)
+            offset += SNAPSHOT_SECTION.size
+            row, model = codec.rows[section], codec.models[section]
+            end = offset + row.size * records
+            state[section] = (next_id, version, [
+                (values[0], model(*map(strings.__getitem__, values[1:])))
+                for values in row.iter_unpack(body[offset:end])
+            ])
+            offset = end
+        return generation, state
+    finally:
+        body.release()